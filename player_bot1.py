@@ -1,8 +1,14 @@
 # -*- coding: utf-8 -*-
+import asyncio
+import contextlib
 import logging
 import json
 import os
+import re
 import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
@@ -10,6 +16,28 @@ from trpgbot_ragmd_sentencetr import find_similar_chunks, generate_answer_with_r
 from dotenv import load_dotenv
 import time
 
+# JSON 파서: orjson이 설치되어 있으면 사용하고, 없으면 표준 json으로 대체
+try:
+    import orjson
+
+    def _json_loads(raw):
+        return orjson.loads(raw)
+
+    def _json_dumps(data):
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+except ImportError:
+    def _json_loads(raw):
+        return json.loads(raw)
+
+    def _json_dumps(data):
+        return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+# 텔레그램 전송 속도 제한기 (aiolimiter가 없으면 제한 없이 전송)
+try:
+    from aiolimiter import AsyncLimiter
+except ImportError:
+    AsyncLimiter = None
+
 # 환경 변수 로드 (로컬 개발 환경용)
 load_dotenv()
 
@@ -24,6 +52,32 @@ logger = logging.getLogger(__name__)
 PLAYER_BOT_TOKEN = os.getenv('PLAYER1_BOT_TOKEN')  # 플레이어 봇 토큰
 MASTER_CHAT_ID = os.getenv('MASTER_CHAT_ID')      # 마스터 봇이 있는 채팅 ID
 
+# 주사위 표기법 패턴 (예: 2d6+3, 1d20-1)
+DICE_PATTERN = re.compile(r'(\d+)d(\d+)([+-]\d+)?')
+
+# 스레드별 난수 생성기 (전역 random 상태 공유 방지)
+_tls = threading.local()
+
+def _rng():
+    """현재 스레드 전용 random.Random 인스턴스 반환"""
+    r = getattr(_tls, 'r', None)
+    if r is None:
+        r = _tls.r = random.Random()
+    return r
+
+# RAG 검색/LLM 호출 전용 스레드 풀 (이벤트 루프 블로킹 방지)
+_RAG_POOL = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 4) * 2), thread_name_prefix="rag")
+RAG_TIMEOUT = 60  # RAG 응답 대기 최대 시간 (초)
+
+# 봇 전체 전송 한도(초당 30건) 아래로 유지하기 위한 제한기
+_send_limiter = AsyncLimiter(25, 1) if AsyncLimiter else None
+
+# 같은 메시지에 대한 동일한 수정 요청 병합용 {(chat_id, message_id): ((text, kwargs), task)}
+_pending_edits = {}
+
+# 대화 기록은 사용자별로 최근 메시지만 보관 (메모리 무한 증가 방지)
+MAX_CONVERSATION_HISTORY = 50
+
 # 플레이어 상태 저장
 player_conversations = {}
 player_character = {}
@@ -32,7 +86,54 @@ player_settings = {}
 class PlayerCharacter:
     """플레이어 캐릭터 클래스"""
     
+    # 인스턴스별 __dict__ 없이 고정 속성만 보관 (메모리 절약)
+    __slots__ = (
+        'name', 'class_type', 'level', 'alignment', 'background', 'personality', 'goals', 'fears',
+        'strength', 'dexterity', 'constitution', 'intelligence', 'wisdom', 'charisma',
+        'hp', 'max_hp', 'ac', 'initiative',
+        'skills', 'equipment', 'spells',
+        '_situation_prefix_cache',
+    )
+    
+    # 캐릭터 성격 프롬프트 템플릿 (호출마다 f-string을 다시 조립하지 않도록 한 번만 정의)
+    _PROMPT_TEMPLATE = """
+당신은 '{name}'라는 {class_type} 캐릭터를 플레이하고 있습니다.
+
+## 캐릭터 정보:
+- **이름**: {name}
+- **클래스**: {class_type} (레벨 {level})
+- **가치관**: {alignment}
+- **배경**: {background}
+- **성격**: {personality}
+- **목표**: {goals}
+- **두려워하는 것**: {fears}
+
+## 능력치:
+- 근력: {strength}, 민첩성: {dexterity}, 건강: {constitution}
+- 지능: {intelligence}, 지혜: {wisdom}, 매력: {charisma}
+- HP: {hp}/{max_hp}, 장갑: {ac}
+
+## 기능: {skills}
+## 주요 장비: {equipment}
+
+## 플레이 가이드라인:
+1. 캐릭터의 성격과 배경에 맞게 행동하세요
+2. 가치관에 따라 도덕적 판단을 하세요
+3. 목표를 달성하려 노력하고, 두려워하는 것은 피하려 하세요
+4. 클래스 특성을 활용한 행동을 제안하세요
+5. 파티원들과 협력하되 개성을 유지하세요
+6. 상황에 맞는 감정 표현을 하세요
+7. 파티원들의 의견에 반대하여 서로 대화로 다투거나 시나리오 상의 분기점을 만드세요.
+
+# 당신의 성격은 쾌활하고 규칙을 따르는 것을 좋아합니다. 그러나 모험을 좋아하고 새로운 것을 시도하는 것을 좋아합니다. 가끔 엉뚱한 행동과 말을 하기도 합니다.
+
+항상 '{name}' 캐릭터의 시점에서 1인칭으로 대화하세요.
+"""
+    
     def __init__(self, character_data=None):
+        # 응답 스타일별 상황 프롬프트 접두부 캐시
+        self._situation_prefix_cache = {}
+        
         if character_data:
             self.load_from_data(character_data)
         else:
@@ -67,77 +168,94 @@ class PlayerCharacter:
     
     def load_from_data(self, data):
         """JSON 데이터에서 캐릭터 로드"""
-        self.name = data.get("이름", "")
-        self.class_type = data.get("클래스", "")
-        self.level = data.get("레벨", 1)
-        self.alignment = data.get("가치관", "")
-        self.background = data.get("배경", "")
-        self.personality = data.get("성격", "")
-        self.goals = data.get("목표", "")
-        self.fears = data.get("두려워하는것", "")
+        get = data.get
+        self.name = get("이름", "")
+        self.class_type = get("클래스", "")
+        self.level = get("레벨", 1)
+        self.alignment = get("가치관", "")
+        self.background = get("배경", "")
+        self.personality = get("성격", "")
+        self.goals = get("목표", "")
+        self.fears = get("두려워하는것", "")
         
         # 능력치
-        self.strength = data.get("근력", 10)
-        self.dexterity = data.get("민첩성", 10)
-        self.constitution = data.get("건강", 10)
-        self.intelligence = data.get("지능", 10)
-        self.wisdom = data.get("지혜", 10)
-        self.charisma = data.get("매력", 10)
+        self.strength = get("근력", 10)
+        self.dexterity = get("민첩성", 10)
+        self.constitution = get("건강", 10)
+        self.intelligence = get("지능", 10)
+        self.wisdom = get("지혜", 10)
+        self.charisma = get("매력", 10)
         
         # 게임 스탯
-        self.hp = data.get("HP", 8)
-        self.max_hp = data.get("최대HP", 8)
-        self.ac = data.get("장갑", 10)
-        self.initiative = data.get("행동순서", 0)
+        self.hp = get("HP", 8)
+        self.max_hp = get("최대HP", 8)
+        self.ac = get("장갑", 10)
+        self.initiative = get("행동순서", 0)
         
         # 기타
-        self.skills = data.get("기능", [])
-        self.equipment = data.get("장비", [])
-        self.spells = data.get("주문", [])
+        self.skills = get("기능", [])
+        self.equipment = get("장비", [])
+        self.spells = get("주문", [])
     
     def get_personality_prompt(self):
         """캐릭터 성격 기반 프롬프트 생성"""
-        return f"""
-당신은 '{self.name}'라는 {self.class_type} 캐릭터를 플레이하고 있습니다.
-
-## 캐릭터 정보:
-- **이름**: {self.name}
-- **클래스**: {self.class_type} (레벨 {self.level})
-- **가치관**: {self.alignment}
-- **배경**: {self.background}
-- **성격**: {self.personality}
-- **목표**: {self.goals}
-- **두려워하는 것**: {self.fears}
-
-## 능력치:
-- 근력: {self.strength}, 민첩성: {self.dexterity}, 건강: {self.constitution}
-- 지능: {self.intelligence}, 지혜: {self.wisdom}, 매력: {self.charisma}
-- HP: {self.hp}/{self.max_hp}, 장갑: {self.ac}
-
-## 기능: {', '.join(self.skills) if self.skills else '없음'}
-## 주요 장비: {', '.join(self.equipment[:3]) if self.equipment else '없음'}
+        ctx = {
+            "name": self.name,
+            "class_type": self.class_type,
+            "level": self.level,
+            "alignment": self.alignment,
+            "background": self.background,
+            "personality": self.personality,
+            "goals": self.goals,
+            "fears": self.fears,
+            "strength": self.strength,
+            "dexterity": self.dexterity,
+            "constitution": self.constitution,
+            "intelligence": self.intelligence,
+            "wisdom": self.wisdom,
+            "charisma": self.charisma,
+            "hp": self.hp,
+            "max_hp": self.max_hp,
+            "ac": self.ac,
+            "skills": ', '.join(self.skills) if self.skills else '없음',
+            "equipment": ', '.join(self.equipment[:3]) if self.equipment else '없음',
+        }
+        return self._PROMPT_TEMPLATE.format_map(ctx)
+    
+    def get_situation_prefix(self, style):
+        """상황 프롬프트 중 캐릭터/응답 스타일별로 고정된 부분 (캐시됨)"""
+        prefix = self._situation_prefix_cache.get(style)
+        if prefix is None:
+            prefix = f"""{self.get_personality_prompt()}
+
+위 상황에서 {self.name}이 어떻게 반응하고 행동할지 결정해주세요.
+
+응답 스타일: {style}
+- active: 적극적으로 행동을 제안하고 주도적으로 나서기
+- balanced: 상황에 맞게 적절히 반응하기  
+- passive: 조심스럽게 반응하고 다른 이의 의견 먼저 듣기
 
-## 플레이 가이드라인:
-1. 캐릭터의 성격과 배경에 맞게 행동하세요
-2. 가치관에 따라 도덕적 판단을 하세요
-3. 목표를 달성하려 노력하고, 두려워하는 것은 피하려 하세요
-4. 클래스 특성을 활용한 행동을 제안하세요
-5. 파티원들과 협력하되 개성을 유지하세요
-6. 상황에 맞는 감정 표현을 하세요
-7. 파티원들의 의견에 반대하여 서로 대화로 다투거나 시나리오 상의 분기점을 만드세요.
 
-# 당신의 성격은 쾌활하고 규칙을 따르는 것을 좋아합니다. 그러나 모험을 좋아하고 새로운 것을 시도하는 것을 좋아합니다. 가끔 엉뚱한 행동과 말을 하기도 합니다.
+아래와 같은 메뉴 중에 상황에 맞는 한가지를 선택하여 대화를 하거나 행동을 묘사해주세요:
+1. {self.name}의 즉각적인 **행동**/감정 - RolePlaying 에 도움이 되고 시나리오의 흐름을 진전 시키는 **행동**과 반응을 제안해주세요.
+2. 취할 행동이나 제안
+3. 필요시 주사위 굴림 제안
+4. 다른 케릭터와 대화
+5. /declare 명령으로 상황 선언, 다른 케릭터들의 행동을 최종 선언
 
-항상 '{self.name}' 캐릭터의 시점에서 1인칭으로 대화하세요.
+# 항상 다른 설명 없이 캐릭터의 시점에서 1인칭으로 대화하거나 행동을 표현하세요.
+ - 예 : 세리나는 아무말 없이 적의 뒤로 돌아가기 위해 살금살금 걸어가겠어요.
 """
+            self._situation_prefix_cache[style] = prefix
+        return prefix
 
 def load_character_from_file(user_id):
     """저장된 캐릭터 파일에서 로드"""
     character_file = f'characters/character_{user_id}.json'
     if os.path.exists(character_file):
         try:
-            with open(character_file, 'r', encoding='utf-8') as f:
-                character_data = json.load(f)
+            with open(character_file, 'rb') as f:
+                character_data = _json_loads(f.read())
             return PlayerCharacter(character_data)
         except Exception as e:
             logger.error(f"캐릭터 로드 오류: {e}")
@@ -147,22 +265,33 @@ def save_player_settings(user_id, settings):
     """플레이어 설정 저장"""
     os.makedirs('player_settings', exist_ok=True)
     settings_file = f'player_settings/player_{user_id}.json'
+    tmp_file = f'{settings_file}.{threading.get_ident()}.tmp'  # 동시 저장 시 임시 파일 충돌 방지
     
     try:
-        with open(settings_file, 'w', encoding='utf-8') as f:
-            json.dump(settings, f, ensure_ascii=False, indent=2)
+        # 임시 파일에 먼저 쓰고 교체하여 저장 도중 중단되어도 기존 파일이 깨지지 않게 함
+        with open(tmp_file, 'wb') as f:
+            f.write(_json_dumps(settings))
+        os.replace(tmp_file, settings_file)
         return True
     except Exception as e:
         logger.error(f"플레이어 설정 저장 오류: {e}")
+        # 실패하면 스레드별 임시 파일이 남지 않도록 정리
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_file)
         return False
 
+async def save_player_settings_async(user_id, settings):
+    """플레이어 설정 저장 (이벤트 루프를 막지 않도록 스레드에서 실행)"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, save_player_settings, user_id, dict(settings))
+
 def load_player_settings(user_id):
     """플레이어 설정 로드"""
     settings_file = f'player_settings/player_{user_id}.json'
     if os.path.exists(settings_file):
         try:
-            with open(settings_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with open(settings_file, 'rb') as f:
+                return _json_loads(f.read())
         except Exception as e:
             logger.error(f"플레이어 설정 로드 오류: {e}")
     
@@ -172,6 +301,33 @@ def load_player_settings(user_id):
         "response_style": "balanced"  # active, balanced, passive
     }
 
+async def _safe_reply(func, *args, **kwargs):
+    """전송 속도 제한을 적용하여 텔레그램 API 호출"""
+    if _send_limiter is None:
+        return await func(*args, **kwargs)
+    async with _send_limiter:
+        return await func(*args, **kwargs)
+
+async def _safe_edit(query, text, **kwargs):
+    """속도 제한 + 동일 메시지에 대한 중복 수정 병합"""
+    message = query.message
+    if message is None:
+        return await _safe_reply(query.edit_message_text, text, **kwargs)
+    
+    key = (message.chat_id, message.message_id)
+    pending = _pending_edits.get(key)
+    if pending and pending[0] == (text, kwargs) and not pending[1].done():
+        # 같은 내용(텍스트와 키보드/파싱 모드 등 옵션 모두)의 수정이 이미 진행 중이면 그 결과를 기다림
+        return await pending[1]
+    
+    task = asyncio.ensure_future(_safe_reply(query.edit_message_text, text, **kwargs))
+    _pending_edits[key] = ((text, kwargs), task)
+    try:
+        return await task
+    finally:
+        if _pending_edits.get(key, (None, None))[1] is task:
+            del _pending_edits[key]
+
 # 명령어 핸들러들
 async def start_command(update: Update, context):
     """시작 명령어"""
@@ -203,7 +359,7 @@ async def start_command(update: Update, context):
 시작하려면 먼저 /character 명령어로 캐릭터를 로드해주세요!
 """
     
-    await update.message.reply_text(welcome_text)
+    await _safe_reply(update.message.reply_text, welcome_text)
 
 async def character_command(update: Update, context):
     """캐릭터 로드 명령어"""
@@ -215,9 +371,9 @@ async def character_command(update: Update, context):
     if character and character.name:
         player_character[user_id] = character
         player_settings[user_id]["character_loaded"] = True
-        save_player_settings(user_id, player_settings[user_id])
+        await save_player_settings_async(user_id, player_settings[user_id])
         
-        await update.message.reply_text(f"""
+        await _safe_reply(update.message.reply_text, f"""
 ✅ **캐릭터가 로드되었습니다!**
 
 🎭 **{character.name}** ({character.class_type})
@@ -237,7 +393,7 @@ async def character_command(update: Update, context):
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await update.message.reply_text(
+        await _safe_reply(update.message.reply_text,
             "저장된 캐릭터가 없습니다. 새로운 캐릭터를 만드시겠어요?",
             reply_markup=reply_markup
         )
@@ -247,7 +403,7 @@ async def status_command(update: Update, context):
     user_id = update.effective_user.id
     
     if user_id not in player_character or not player_character[user_id].name:
-        await update.message.reply_text("먼저 /character 명령어로 캐릭터를 로드해주세요.")
+        await _safe_reply(update.message.reply_text, "먼저 /character 명령어로 캐릭터를 로드해주세요.")
         return
     
     character = player_character[user_id]
@@ -274,7 +430,7 @@ async def status_command(update: Update, context):
 - 응답 스타일: {settings.get('response_style', 'balanced')}
 """
     
-    await update.message.reply_text(status_text)
+    await _safe_reply(update.message.reply_text, status_text)
 
 async def settings_command(update: Update, context):
     """설정 명령어"""
@@ -291,7 +447,7 @@ async def settings_command(update: Update, context):
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
-    await update.message.reply_text(
+    await _safe_reply(update.message.reply_text,
         "🛠️ **플레이어 봇 설정**\n\n어떤 설정을 변경하시겠어요?",
         reply_markup=reply_markup
     )
@@ -330,14 +486,14 @@ async def help_command(update: Update, context):
 즐거운 모험 되세요! 🎲✨
 """
     
-    await update.message.reply_text(help_text)
+    await _safe_reply(update.message.reply_text, help_text)
 
 async def roll_command(update: Update, context):
     """주사위 굴리기 명령어"""
     user_id = update.effective_user.id
     
     if user_id not in player_character or not player_character[user_id].name:
-        await update.message.reply_text("먼저 캐릭터를 로드해주세요.")
+        await _safe_reply(update.message.reply_text, "먼저 캐릭터를 로드해주세요.")
         return
     
     character = player_character[user_id]
@@ -352,7 +508,7 @@ async def roll_command(update: Update, context):
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await update.message.reply_text(
+        await _safe_reply(update.message.reply_text,
             f"🎲 **{character.name}의 주사위 굴리기**\n\n어떤 주사위를 굴리시겠어요?",
             reply_markup=reply_markup
         )
@@ -363,22 +519,19 @@ async def roll_command(update: Update, context):
     result = roll_dice(dice_notation)
     
     if result:
-        await update.message.reply_text(
+        await _safe_reply(update.message.reply_text,
             f"🎲 **{character.name}**: {dice_notation} → **{result['total']}**\n"
             f"상세: {result['details']}"
         )
     else:
-        await update.message.reply_text(
+        await _safe_reply(update.message.reply_text,
             "올바른 주사위 표기법을 사용해주세요. (예: 1d20, 3d6+2)"
         )
 
 def roll_dice(notation):
     """주사위 굴리기 함수"""
-    import re
-    
     # 주사위 표기법 파싱 (예: 2d6+3, 1d20-1)
-    pattern = r'(\d+)d(\d+)([+-]\d+)?'
-    match = re.match(pattern, notation.lower())
+    match = DICE_PATTERN.match(notation.lower())
     
     if not match:
         return None
@@ -390,7 +543,8 @@ def roll_dice(notation):
     if num_dice > 20 or die_size > 100:  # 제한
         return None
     
-    rolls = [random.randint(1, die_size) for _ in range(num_dice)]
+    rng = _rng()
+    rolls = [rng.randint(1, die_size) for _ in range(num_dice)]
     total = sum(rolls) + modifier
     
     details = f"[{', '.join(map(str, rolls))}]"
@@ -414,13 +568,13 @@ async def button_callback(update: Update, context):
     
     if data == "create_random":
         # 랜덤 캐릭터 생성 (마스터 봇의 랜덤 생성 기능 활용)
-        await query.edit_message_text(
+        await _safe_edit(query,
             "🎲 랜덤 캐릭터를 생성하려면 마스터 봇에서 먼저 캐릭터를 생성해주세요.\n"
             "생성 후 다시 /character 명령어를 사용하면 자동으로 로드됩니다."
         )
     
     elif data == "create_manual":
-        await query.edit_message_text(
+        await _safe_edit(query,
             "✍️ 직접 캐릭터를 입력하려면 마스터 봇에서 캐릭터 생성 세션을 진행해주세요.\n"
             "생성 후 다시 /character 명령어를 사용하면 자동으로 로드됩니다."
         )
@@ -429,10 +583,10 @@ async def button_callback(update: Update, context):
         settings = player_settings.get(user_id, load_player_settings(user_id))
         settings["auto_response"] = not settings.get("auto_response", False)
         player_settings[user_id] = settings
-        save_player_settings(user_id, settings)
+        await save_player_settings_async(user_id, settings)
         
         status = "켜짐" if settings["auto_response"] else "꺼짐"
-        await query.edit_message_text(f"🤖 자동 응답이 {status}되었습니다.")
+        await _safe_edit(query, f"🤖 자동 응답이 {status}되었습니다.")
     
     elif data == "change_style":
         keyboard = [
@@ -442,7 +596,7 @@ async def button_callback(update: Update, context):
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await query.edit_message_text(
+        await _safe_edit(query,
             "🎭 **응답 스타일 선택:**\n\n"
             "🔥 적극적: 항상 먼저 행동을 제안\n"
             "⚖️ 균형잡힌: 상황에 맞게 반응\n"
@@ -455,15 +609,15 @@ async def button_callback(update: Update, context):
         settings = player_settings.get(user_id, load_player_settings(user_id))
         settings["response_style"] = style
         player_settings[user_id] = settings
-        save_player_settings(user_id, settings)
+        await save_player_settings_async(user_id, settings)
         
         style_names = {"active": "적극적", "balanced": "균형잡힌", "passive": "소극적"}
-        await query.edit_message_text(f"🎭 응답 스타일이 '{style_names[style]}'으로 변경되었습니다.")
+        await _safe_edit(query, f"🎭 응답 스타일이 '{style_names[style]}'으로 변경되었습니다.")
     
     elif data.startswith("roll_"):
         character = player_character.get(user_id)
         if not character:
-            await query.edit_message_text("먼저 캐릭터를 로드해주세요.")
+            await _safe_edit(query, "먼저 캐릭터를 로드해주세요.")
             return
         
         if data == "roll_1d20":
@@ -480,7 +634,7 @@ async def button_callback(update: Update, context):
             result = roll_dice(f"1d20+{save_bonus}")
         
         if result:
-            await query.edit_message_text(
+            await _safe_edit(query,
                 f"🎲 **{character.name}**: {data.replace('roll_', '')} → **{result['total']}**\n"
                 f"상세: {result['details']}"
             )
@@ -493,13 +647,13 @@ async def handle_message(update: Update, context):
     
     # 대화 기록 저장
     if user_id not in player_conversations:
-        player_conversations[user_id] = []
+        player_conversations[user_id] = deque(maxlen=MAX_CONVERSATION_HISTORY)
     
     player_conversations[user_id].append(f"플레이어: {text}")
     
     # 캐릭터가 로드되지 않은 경우
     if user_id not in player_character or not player_character[user_id].name:
-        await update.message.reply_text(
+        await _safe_reply(update.message.reply_text,
             "먼저 /character 명령어로 캐릭터를 로드해주세요."
         )
         return
@@ -507,44 +661,31 @@ async def handle_message(update: Update, context):
     character = player_character[user_id]
     settings = player_settings.get(user_id, {})
     
-    # 캐릭터 관점에서 응답 생성
-    character_prompt = character.get_personality_prompt()
-    
-    # 상황 분석 및 응답 생성
-    situation_context = f"""
-상황: {text}
-
-{character_prompt}
-
-위 상황에서 {character.name}이 어떻게 반응하고 행동할지 결정해주세요.
-
-응답 스타일: {settings.get('response_style', 'balanced')}
-- active: 적극적으로 행동을 제안하고 주도적으로 나서기
-- balanced: 상황에 맞게 적절히 반응하기  
-- passive: 조심스럽게 반응하고 다른 이의 의견 먼저 듣기
-
-
-아래와 같은 메뉴 중에 상황에 맞는 한가지를 선택하여 대화를 하거나 행동을 묘사해주세요:
-1. {character.name}의 즉각적인 **행동**/감정 - RolePlaying 에 도움이 되고 시나리오의 흐름을 진전 시키는 **행동**과 반응을 제안해주세요.
-2. 취할 행동이나 제안
-3. 필요시 주사위 굴림 제안
-4. 다른 케릭터와 대화
-5. /declare 명령으로 상황 선언, 다른 케릭터들의 행동을 최종 선언
-
-# 항상 다른 설명 없이 캐릭터의 시점에서 1인칭으로 대화하거나 행동을 표현하세요.
- - 예 : 세리나는 아무말 없이 적의 뒤로 돌아가기 위해 살금살금 걸어가겠어요.
-"""
+    # 상황 분석 및 응답 생성 (캐릭터 관점의 고정 프롬프트는 캐시 재사용)
+    situation_context = f"\n상황: {text}\n\n" + character.get_situation_prefix(settings.get('response_style', 'balanced'))
     # 다음 형식으로 답변해주세요
     # time.sleep(1)
-    # RAG를 통한 응답 생성
-    relevant_chunks = find_similar_chunks(text, match_count=2, match_threshold=0.5)
-    response = generate_answer_with_rag(situation_context, relevant_chunks, "플레이어", "")
+    # RAG를 통한 응답 생성 (스레드 풀에서 실행하여 다른 사용자 요청을 막지 않음)
+    loop = asyncio.get_running_loop()
+    try:
+        relevant_chunks = await asyncio.wait_for(
+            loop.run_in_executor(_RAG_POOL, find_similar_chunks, text, 2, 0.5),
+            timeout=RAG_TIMEOUT
+        )
+        response = await asyncio.wait_for(
+            loop.run_in_executor(_RAG_POOL, generate_answer_with_rag, situation_context, relevant_chunks, "플레이어", ""),
+            timeout=RAG_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        logger.error(f"⏰ RAG 응답 생성 타임아웃 ({RAG_TIMEOUT}초)")
+        await _safe_reply(update.message.reply_text, "응답 생성 시간이 초과되었습니다. 잠시 후 다시 시도해주세요.")
+        return
     
     # 봇 응답 저장
     player_conversations[user_id].append(f"{character.name}: {response}")
     
     # 응답 전송
-    await update.message.reply_text(f"🎭 **{character.name}**\n\n{response}")
+    await _safe_reply(update.message.reply_text, f"🎭 **{character.name}**\n\n{response}")
 
 def main():
     """메인 함수"""
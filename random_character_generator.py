@@ -1,9 +1,35 @@
 # -*- coding: utf-8 -*-
 import random
+import threading
+import time
 from copy import deepcopy
 from datetime import datetime
 from config import CLASS_DEFAULTS
 
+# 스레드별 난수 생성기 (전역 random 상태 공유 방지)
+_tls = threading.local()
+
+def _rng():
+    """현재 스레드 전용 random.Random 인스턴스 반환"""
+    r = getattr(_tls, 'r', None)
+    if r is None:
+        r = _tls.r = random.Random()
+    return r
+
+# 초 단위로 포맷된 현재 시각 캐시 (epoch 초, 포맷 문자열)
+# 여러 스레드가 동시에 읽으므로 불변 튜플 하나로 두고 한 번에 교체
+_ts_cache = (0, "")
+
+def _now_str():
+    """현재 시각 문자열 반환 (같은 초 안에서는 포맷 결과 재사용)"""
+    global _ts_cache
+    t = int(time.time())
+    cached_t, cached_s = _ts_cache
+    if t != cached_t:
+        cached_s = datetime.fromtimestamp(t).strftime("%Y-%m-%d %H:%M:%S")
+        _ts_cache = (t, cached_s)
+    return cached_s
+
 class RandomCharacterGenerator:
     """랜덤 캐릭터 생성을 담당하는 클래스"""
     
@@ -24,79 +50,92 @@ class RandomCharacterGenerator:
     SKILLS = ["운동", "곡예", "은신", "손재주", "아케인", "역사", "조사", "자연", 
               "종교", "동물조련", "통찰", "의학", "지각", "생존", "설득", "속임수", "위협"]
     
+    # 클래스별 무기/갑옷 선택지 (호출마다 새로 만들지 않도록 불변 튜플로 보관)
+    _WARRIOR_WEAPONS = (("롱소드", "방패"), ("배틀액스",), ("그레이트소드",), ("할버드",))
+    _ROGUE_WEAPONS = (("단검", "단검"), ("숏소드", "단검"), ("라이트 크로스보우", "단검"))
+    _MAGE_WEAPONS = (("쿼터스태프",), ("단검",), ("라이트 크로스보우",))
+    _WARRIOR_ARMOR = ("사슬 갑옷", "판금 갑옷")
+    _ROGUE_ARMOR = ("가죽 갑옷",)
+    _MAGE_ARMOR = ("없음",)
+    
+    # 체력 주사위별 1레벨 최대 체력
+    _HIT_DIE_MAX = {"d6": 6, "d8": 8, "d10": 10}
+    
+    CLASS_EQUIPMENT = {
+        "전사": (_WARRIOR_WEAPONS, _WARRIOR_ARMOR),
+        "도적": (_ROGUE_WEAPONS, _ROGUE_ARMOR),
+        "마법사": (_MAGE_WEAPONS, _MAGE_ARMOR),
+    }
+    
     @classmethod
     def generate_random_name(cls):
         """랜덤 이름 생성"""
-        first_name = random.choice(cls.FIRST_NAMES)
-        last_name = random.choice(cls.LAST_NAMES)
+        rng = _rng()
+        first_name = rng.choice(cls.FIRST_NAMES)
+        last_name = rng.choice(cls.LAST_NAMES)
         return f"{first_name} {last_name}"
     
     @classmethod
     def generate_random_class(cls):
         """랜덤 클래스 선택"""
-        return random.choice(cls.CLASSES)
+        return _rng().choice(cls.CLASSES)
     
     @classmethod
     def generate_random_alignment(cls):
         """랜덤 가치관 선택"""
-        return random.choice(cls.ALIGNMENTS)
+        return _rng().choice(cls.ALIGNMENTS)
     
     @classmethod
     def generate_random_abilities(cls):
         """랜덤 능력치 생성 (4d6 중 최저값 제외 방식)"""
+        rng = _rng()
         abilities = {}
         ability_names = ["근력", "민첩성", "건강", "지능", "지혜", "매력"]
         
         for ability in ability_names:
             # 4d6 굴리고 가장 낮은 값 제외
-            rolls = [random.randint(1, 6) for _ in range(4)]
-            rolls.sort()
-            abilities[ability] = sum(rolls[1:])  # 최저값 제외하고 합산
+            rolls = [rng.randint(1, 6) for _ in range(4)]
+            abilities[ability] = sum(rolls) - min(rolls)  # 최저값 제외하고 합산
         
         return abilities
     
     @classmethod
     def generate_random_skills(cls, num_skills=None):
         """랜덤 기능 선택"""
+        rng = _rng()
         if num_skills is None:
-            num_skills = random.randint(2, 3)  # 2~3개의 기능
+            num_skills = rng.randint(2, 3)  # 2~3개의 기능
+        
+        n = len(cls.SKILLS)
+        k = min(num_skills, n)
+        if k * 2 > n:
+            return rng.sample(cls.SKILLS, k)
         
-        return random.sample(cls.SKILLS, min(num_skills, len(cls.SKILLS)))
+        # 뽑을 개수가 적으면 중복 거부 방식이 sample보다 가벼움
+        chosen = []
+        while len(chosen) < k:
+            i = rng.randrange(n)
+            if i not in chosen:
+                chosen.append(i)
+        return [cls.SKILLS[i] for i in chosen]
     
     @classmethod
     def generate_class_equipment(cls, character_class):
         """클래스에 따른 랜덤 장비 생성"""
-        if character_class == "전사":
-            weapons = random.choice([
-                ["롱소드", "방패"], 
-                ["배틀액스"], 
-                ["그레이트소드"], 
-                ["할버드"]
-            ])
-            armor = random.choice(["사슬 갑옷", "판금 갑옷"])
-        elif character_class == "도적":
-            weapons = random.choice([
-                ["단검", "단검"], 
-                ["숏소드", "단검"], 
-                ["라이트 크로스보우", "단검"]
-            ])
-            armor = "가죽 갑옷"
-        else:  # 마법사
-            weapons = random.choice([
-                ["쿼터스태프"], 
-                ["단검"], 
-                ["라이트 크로스보우"]
-            ])
-            armor = "없음"
+        weapon_choices, armor_choices = cls.CLASS_EQUIPMENT.get(character_class, cls.CLASS_EQUIPMENT["마법사"])
+        rng = _rng()
+        weapons = rng.choice(weapon_choices)
+        armor = rng.choice(armor_choices)
         
         return weapons, armor
     
     @classmethod
     def generate_random_money(cls):
         """랜덤 소지금 생성"""
+        rng = _rng()
         return {
             "동화": 0,
-            "은화": sum([random.randint(1, 6) for _ in range(4)]),  # 4d6
+            "은화": sum([rng.randint(1, 6) for _ in range(4)]),  # 4d6
             "금화": 0
         }
     
@@ -106,6 +145,7 @@ class RandomCharacterGenerator:
         # 기본 정보 생성
         name = cls.generate_random_name()
         character_class = cls.generate_random_class()
+        cls_defaults = CLASS_DEFAULTS[character_class]
         alignment = cls.generate_random_alignment()
         abilities = cls.generate_random_abilities()
         skills = cls.generate_random_skills()
@@ -119,7 +159,7 @@ class RandomCharacterGenerator:
         derived_stats = cls.calculate_derived_stats(character_class, modifiers)
         
         # 현재 시간
-        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        now = _now_str()
         
         # 캐릭터 데이터 구성
         character_data = {
@@ -145,9 +185,9 @@ class RandomCharacterGenerator:
             "언어": derived_stats["언어"],
             "행운점수": derived_stats["행운점수"],
             "장비": {
-                "착용가능갑옷": CLASS_DEFAULTS[character_class]["착용가능갑옷"],
+                "착용가능갑옷": cls_defaults["착용가능갑옷"],
                 "소지품": ["간편한 옷", "모험 장비"],
-                "무기": weapons,
+                "무기": list(weapons),
                 "갑옷": armor,
                 "소지금": money
             },
@@ -185,18 +225,22 @@ class RandomCharacterGenerator:
     def calculate_derived_stats(cls, character_class, modifiers):
         """파생 능력치 계산"""
         cls_defaults = CLASS_DEFAULTS[character_class]
+        hit_dice = cls_defaults["체력주사위"]
+        base_attack_bonus = cls_defaults["기본공격보너스"]
+        initiative_bonus = cls_defaults["행동순서_보너스"]
+        luck = cls_defaults["행운점수"]
+        dex_mod = modifiers.get("민첩성", 0)
         
         # 체력 계산
-        hit_dice = cls_defaults["체력주사위"]
-        max_hp = {"d6": 6, "d8": 8, "d10": 10}.get(hit_dice, 8)
+        max_hp = cls._HIT_DIE_MAX.get(hit_dice, 8)
         max_hp += modifiers.get("건강", 0)
         max_hp = max(max_hp, 1)  # 최소 1
         
         # AC 계산
-        ac = 10 + modifiers.get("민첩성", 0)
+        ac = 10 + dex_mod
         
         # 행동순서 계산
-        initiative = 1 + modifiers.get("민첩성", 0) + cls_defaults["행동순서_보너스"]
+        initiative = 1 + dex_mod + initiative_bonus
         
         # 추가 언어 처리
         languages = ["공용어"]
@@ -211,23 +255,24 @@ class RandomCharacterGenerator:
                 "체력주사위": hit_dice
             },
             "장갑클래스": ac,
-            "기본공격보너스": cls_defaults["기본공격보너스"],
+            "기본공격보너스": base_attack_bonus,
             "행동순서": initiative,
             "언어": languages,
             "행운점수": {
-                "최대": cls_defaults["행운점수"],
-                "현재": cls_defaults["행운점수"]
+                "최대": luck,
+                "현재": luck
             }
         }
     
     @classmethod
     def roll_abilities(cls):
         """능력치 굴리기만 (배정하지 않음)"""
+        rng = _rng()
         ability_scores = []
         for _ in range(6):  # 6개 능력치
             # 4d6 굴리고 가장 낮은 주사위 제외
-            rolls = [random.randint(1, 6) for _ in range(4)]
-            total = sum(sorted(rolls)[1:])  # 가장 낮은 주사위 제외하고 합산
+            rolls = [rng.randint(1, 6) for _ in range(4)]
+            total = sum(rolls) - min(rolls)  # 가장 낮은 주사위 제외하고 합산
             ability_scores.append(total)
         
         return ability_scores 
\ No newline at end of file
@@ -1,127 +1,190 @@
+import os
+import sys
 import numpy as np
+import matplotlib as mpl
+# 디스플레이가 없는 환경(서버에서 호출 등)에서는 GUI 백엔드 초기화 없이 파일 저장용 Agg 백엔드 사용
+if (os.name != 'nt' and sys.platform != 'darwin'
+        and not os.environ.get('DISPLAY') and not os.environ.get('MPLBACKEND')):
+    mpl.use('Agg')
 import matplotlib.pyplot as plt
 from matplotlib.patches import Polygon
-from matplotlib.colors import LinearSegmentedColormap
-import matplotlib as mpl
+from matplotlib.collections import PolyCollection
+from matplotlib.colors import LinearSegmentedColormap, to_rgba_array
 import heapq  # 다익스트라 알고리즘을 위한 우선순위 큐
 from collections import deque  # BFS를 위한 큐
 
+# numba가 설치되어 있으면 방 배치/복도 그리기와 BFS를 네이티브 코드로 컴파일해서 사용
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# scipy가 설치되어 있으면 병목 경로 탐색(과 numba가 없을 때의 BFS)을 컴파일된 그래프 탐색(csgraph)으로 수행
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import breadth_first_order
+except ImportError:
+    csr_matrix = None
+
 # 폰트 설정 (한글 표시)
 plt.rcParams['font.family'] = 'Malgun Gothic'  # 윈도우 기본 한글 폰트
 plt.rcParams['axes.unicode_minus'] = False  # 마이너스 기호 깨짐 방지
 
-# 던전과 높이 맵 생성 함수
-def generate_dungeon(width, height, room_count=8, room_min=8, room_max=15, min_room_distance=3):
-    dungeon = np.zeros((height, width), dtype=int)
-    rooms = []
-    attempts = 0
-    max_attempts = 100
+def _place_rooms(dungeon, rooms_arr, rand, room_min, room_max, min_room_distance):
+    """
+    미리 뽑아 둔 균등 난수 rand (시도 횟수, 4)로 방 배치 - numba로 컴파일 가능
+    방 정보는 rooms_arr (열: x, y, w, h)에 채우고 배치된 방 개수 반환
+    """
+    height, width = dungeon.shape
+    d = min_room_distance
+    n_rooms = 0
     
     # 방 생성 (방 사이 간격 확보)
-    while len(rooms) < room_count and attempts < max_attempts:
-        w = np.random.randint(room_min, room_max)
-        h = np.random.randint(room_min, room_max)
-        x = np.random.randint(1, width - w - 1)
-        y = np.random.randint(1, height - h - 1)
+    for a in range(rand.shape[0]):
+        if n_rooms == rooms_arr.shape[0]:
+            break
+        w = room_min + int(rand[a, 0] * (room_max - room_min))
+        h = room_min + int(rand[a, 1] * (room_max - room_min))
+        x = 1 + int(rand[a, 2] * (width - w - 2))
+        y = 1 + int(rand[a, 3] * (height - h - 2))
         
         # 새 방이 기존 방과 충분한 거리를 유지하는지 확인
-        too_close = False
-        for rx, ry, rw, rh in rooms:
-            # 두 방 사이 최소 거리 확인 (가로, 세로 모두 min_room_distance 이상 떨어져야 함)
-            if not (x + w + min_room_distance <= rx or rx + rw + min_room_distance <= x or
-                   y + h + min_room_distance <= ry or ry + rh + min_room_distance <= y):
-                too_close = True
-                break
-        
-        attempts += 1
-        if too_close:
+        # (가로, 세로 모두 min_room_distance 이상 떨어져야 함)
+        placed = rooms_arr[:n_rooms]
+        ax, ay, aw, ah = placed[:, 0], placed[:, 1], placed[:, 2], placed[:, 3]
+        if np.any(~((x + w + d <= ax) | (ax + aw + d <= x) |
+                    (y + h + d <= ay) | (ay + ah + d <= y))):
             continue
             
         # 방 추가
         dungeon[y:y+h, x:x+w] = 1
-        rooms.append((x, y, w, h))
+        rooms_arr[n_rooms, 0] = x
+        rooms_arr[n_rooms, 1] = y
+        rooms_arr[n_rooms, 2] = w
+        rooms_arr[n_rooms, 3] = h
+        n_rooms += 1
     
-    # 방 연결 (복도 생성) - 넓은 복도 (2칸 너비)
-    for i in range(1, len(rooms)):
-        x1, y1, w1, h1 = rooms[i-1]
-        x2, y2, w2, h2 = rooms[i]
-        cx1, cy1 = x1 + w1//2, y1 + h1//2
-        cx2, cy2 = x2 + w2//2, y2 + h2//2
+    return n_rooms
+
+def _draw_corridors(dungeon, centers, choices):
+    """
+    이웃한 방의 중심 centers (N, 2; 열: cx, cy)끼리 2칸 너비 ㄱ자 복도로 연결 - numba로 컴파일 가능
+    choices[i-1] < 0.5이면 수직 후 수평, 아니면 수평 후 수직
+    """
+    for i in range(1, centers.shape[0]):
+        cx1, cy1 = centers[i-1, 0], centers[i-1, 1]
+        cx2, cy2 = centers[i, 0], centers[i, 1]
+        
+        min_y, max_y = min(cy1, cy2), max(cy1, cy2)
+        min_x, max_x = min(cx1, cx2), max(cx1, cx2)
         
-        if np.random.rand() < 0.5:
+        # 구간마다 슬라이스 대입 한 번으로 2칸 너비 띠를 채움
+        if choices[i-1] < 0.5:
             # 수직 후 수평 연결 (2칸 너비)
-            min_y, max_y = min(cy1, cy2), max(cy1, cy2)
-            for corridor_y in range(min_y, max_y+1):
-                dungeon[corridor_y, cx1] = 1
-                dungeon[corridor_y, cx1+1] = 1  # 두 칸 너비
-            
-            min_x, max_x = min(cx1, cx2), max(cx1, cx2)
-            for corridor_x in range(min_x, max_x+1):
-                dungeon[cy2, corridor_x] = 1
-                dungeon[cy2+1, corridor_x] = 1  # 두 칸 너비
+            dungeon[min_y:max_y+1, cx1:cx1+2] = 1
+            dungeon[cy2:cy2+2, min_x:max_x+1] = 1
         else:
             # 수평 후 수직 연결 (2칸 너비)
-            min_x, max_x = min(cx1, cx2), max(cx1, cx2)
-            for corridor_x in range(min_x, max_x+1):
-                dungeon[cy1, corridor_x] = 1
-                dungeon[cy1+1, corridor_x] = 1  # 두 칸 너비
-            
-            min_y, max_y = min(cy1, cy2), max(cy1, cy2)
-            for corridor_y in range(min_y, max_y+1):
-                dungeon[corridor_y, cx2] = 1
-                dungeon[corridor_y, cx2+1] = 1  # 두 칸 너비
+            dungeon[cy1:cy1+2, min_x:max_x+1] = 1
+            dungeon[min_y:max_y+1, cx2:cx2+2] = 1
+
+if njit is not None:
+    _place_rooms = njit(cache=True)(_place_rooms)
+    _draw_corridors = njit(cache=True)(_draw_corridors)
+
+# 방 정보 레코드 형식 (열 단위로 꺼내 배열 연산에 바로 사용)
+ROOM_DTYPE = np.dtype([('x', 'i2'), ('y', 'i2'), ('w', 'i2'), ('h', 'i2')])
+
+# 던전과 높이 맵 생성 함수
+def generate_dungeon(width, height, room_count=8, room_min=8, room_max=15, min_room_distance=3):
+    dungeon = np.zeros((height, width), dtype=np.uint8)  # 0: 빈 공간, 1: 던전 타일
+    # 방 정보를 (N, 4) 배열로 보관 (열: x, y, w, h) - 겹침 검사를 한 번의 배열 연산으로 처리
+    rooms_arr = np.empty((room_count, 4), dtype=np.int16)
+    max_attempts = 100
+    
+    # 난수는 numpy 전역 생성기에서 미리 뽑아 넘김 (numba 컴파일 여부와 관계없이 np.random.seed로 재현 가능)
+    rand = np.random.rand(max_attempts, 4)
+    n_rooms = _place_rooms(dungeon, rooms_arr, rand, room_min, room_max, min_room_distance)
+    
+    # 반환용 방 레코드 배열 (필드: x, y, w, h)과 복도 연결에 쓸 방 중심 (cx, cy)
+    rooms = np.empty(n_rooms, dtype=ROOM_DTYPE)
+    for j, name in enumerate(ROOM_DTYPE.names):
+        rooms[name] = rooms_arr[:n_rooms, j]
+    centers = rooms_arr[:n_rooms, :2] + rooms_arr[:n_rooms, 2:] // 2
+    
+    # 방 연결 (복도 생성) - 넓은 복도 (2칸 너비)
+    choices = np.random.rand(max(n_rooms - 1, 0))
+    _draw_corridors(dungeon, centers, choices)
     
     return dungeon, rooms
 
+def smooth_noise(noise, smoothness):
+    """
+    상하좌우+자기 자신 5점 평균(경계 순환)을 smoothness번 반복한 것과 같은 결과를
+    FFT 한 번으로 계산 (순환 합성곱이므로 커널을 smoothness 제곱하면 됨)
+    """
+    if smoothness <= 0:
+        return noise
+    
+    h, w = noise.shape
+    kernel = np.zeros((h, w))
+    for ky, kx in ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)):
+        kernel[ky % h, kx % w] += 1 / 5
+    
+    spectrum = np.fft.rfft2(noise) * np.fft.rfft2(kernel) ** smoothness
+    return np.fft.irfft2(spectrum, s=(h, w))
+
+def room_masks(rooms, shape):
+    """
+    방 레코드 배열로 격자 마스크를 한 번에 만들기 (방마다 (H, W) 마스크를 브로드캐스팅으로 계산)
+    반환: (칸별 방 번호, 방 영역 여부, 방 내부(테두리 제외) 여부)
+    """
+    ys = np.arange(shape[0])[None, :, None]
+    xs = np.arange(shape[1])[None, None, :]
+    x, y, w, h = (rooms[name].astype(np.intp)[:, None, None] for name in ROOM_DTYPE.names)
+    
+    in_room = (xs >= x) & (xs < x + w) & (ys >= y) & (ys < y + h)
+    interior = (xs > x) & (xs < x + w - 1) & (ys > y) & (ys < y + h - 1)
+    # 방끼리는 겹치지 않으므로 칸마다 최대 한 개의 방에만 속함
+    return in_room.argmax(axis=0), in_room.any(axis=0), interior.any(axis=0)
+
 def generate_height_map(dungeon, rooms, smoothness=5, max_height=15):
     # 노이즈 기반 높이 맵 생성
     noise = np.random.rand(*dungeon.shape)
     
     # 노이즈 부드럽게 만들기
-    for _ in range(smoothness):
-        noise = (noise +
-                np.roll(noise, 1, axis=0) + np.roll(noise, -1, axis=0) +
-                np.roll(noise, 1, axis=1) + np.roll(noise, -1, axis=1)) / 5
+    noise = smooth_noise(noise, smoothness)
     
-    # 던전 영역에만 높이 적용
-    height_map = (noise * max_height).astype(int) * (dungeon == 1)
+    # 던전 영역에만 높이 적용 (높이는 작은 정수이므로 int16으로 보관해 메모리 절약)
+    height_map = (noise * max_height).astype(np.int16) * (dungeon == 1)
     
     # 각 방마다 크게 다른 높이 할당 (1~15 사이의 값)
     room_heights = np.random.randint(1, max_height + 1, size=len(rooms))
     
     # 방들은 내부 높이는 더 일정하게, 방마다 높이 차이는 더 크게 만들기
-    for i, (x, y, w, h) in enumerate(rooms):
-        # 이 방의 기본 높이 - 각 방마다 크게 다르게
-        base_height = room_heights[i]
-        
-        # 방 전체를 일정한 높이로 설정 (아주 작은 변화만 추가)
-        for ry in range(y, y+h):
-            for rx in range(x, x+w):
-                if dungeon[ry, rx] == 1:
-                    # 가장자리는 아주 작은 높이 변화만 추가
-                    if rx == x or rx == x+w-1 or ry == y or ry == y+h-1:
-                        height_map[ry, rx] = base_height + np.random.randint(-1, 2) // 2  # 더 작은 변화
-                    else:
-                        # 내부는 거의 동일한 높이
-                        height_map[ry, rx] = base_height
+    # 방 전체를 일정한 높이로 설정하고 가장자리에만 아주 작은 변화 추가 (모든 방을 한 번에 처리)
+    room_id, in_room, interior = room_masks(rooms, dungeon.shape)
+    edge = in_room & ~interior
+    perturb = np.random.randint(-1, 2, size=dungeon.shape) // 2  # 더 작은 변화
+    mask = in_room & (dungeon == 1)
+    height_map[mask] = (room_heights[room_id] + np.where(edge, perturb, 0))[mask]
     
     # 복도 높이 조정 - 복도를 좀 더 낮게 만들기
-    for y in range(1, dungeon.shape[0]-1):
-        for x in range(1, dungeon.shape[1]-1):
-            # 던전 타일인데 주변 8방향 중 빈 공간이 있으면 복도로 간주
-            if dungeon[y, x] == 1:
-                neighbors = dungeon[y-1:y+2, x-1:x+2].flatten()
-                if 0 in neighbors:  # 주변에 빈 공간이 있으면 복도일 가능성이 높음
-                    # 방 내부가 아닌 복도로 판단되는 경우
-                    is_in_room = False
-                    for rx, ry, rw, rh in rooms:
-                        if rx+1 <= x <= rx+rw-2 and ry+1 <= y <= ry+rh-2:  # 방 내부(테두리 제외)
-                            is_in_room = True
-                            break
-                    
-                    if not is_in_room:
-                        # 복도는 낮은 높이로 설정 (1~3)
-                        height_map[y, x] = np.random.randint(1, 4)
+    map_h, map_w = dungeon.shape
+    
+    # 던전 타일인데 주변 8방향 중 빈 공간이 있으면 복도로 간주 (맵 테두리 제외)
+    has_empty = np.zeros((map_h - 2, map_w - 2), dtype=bool)
+    for dy in range(3):
+        for dx in range(3):
+            has_empty |= dungeon[dy:dy+map_h-2, dx:dx+map_w-2] == 0
+    corridor = np.zeros(dungeon.shape, dtype=bool)
+    corridor[1:-1, 1:-1] = (dungeon[1:-1, 1:-1] == 1) & has_empty
+    
+    # 방 내부(테두리 제외)는 복도에서 제외
+    corridor &= ~interior
+    
+    # 복도는 낮은 높이로 설정 (1~3)
+    height_map[corridor] = np.random.randint(1, 4, size=np.count_nonzero(corridor))
     
     # 음수 높이 제거
     height_map = np.maximum(height_map, 0)
@@ -130,84 +193,230 @@ def generate_height_map(dungeon, rooms, smoothness=5, max_height=15):
 
 def select_entrance_exit(dungeon, rooms):
     """입구와 출구 선택 (같은 위치일 수도 있음)"""
+    n_rooms = len(rooms)
+    # 필요한 난수를 한 번에 뽑기: [입구 방, 같은 방 여부, 출구 방, 입구 x, 입구 y, 출구 x, 출구 y]
+    r = np.random.rand(7)
+    
     # 방들 중에서 랜덤하게 입구와 출구가 있을 방 선택
-    entrance_room_idx = np.random.randint(0, len(rooms))
+    entrance_room_idx = int(r[0] * n_rooms)
     
-    # 20% 확률로 입구와 출구가 같은 방
-    if np.random.rand() < 0.2:
+    # 20% 확률로 입구와 출구가 같은 방 (방이 하나뿐이면 항상 같은 방)
+    if r[1] < 0.2 or n_rooms == 1:
         exit_room_idx = entrance_room_idx
     else:
-        # 다른 방들 중에서 출구 선택
-        other_rooms = list(range(len(rooms)))
-        other_rooms.remove(entrance_room_idx)
-        exit_room_idx = np.random.choice(other_rooms)
+        # 다른 방들 중에서 출구 선택 (입구 방 번호를 건너뛰도록 한 칸 밀기)
+        exit_room_idx = int(r[2] * (n_rooms - 1))
+        exit_room_idx += exit_room_idx >= entrance_room_idx
     
-    # 선택된 방들의 정보
-    entrance_room = rooms[entrance_room_idx]
-    exit_room = rooms[exit_room_idx]
+    # 방 내부(테두리 제외)의 랜덤한 위치 선택 (레코드 필드를 직접 인덱싱)
+    xs, ys, ws, hs = (rooms[name].astype(int) for name in ROOM_DTYPE.names)
+    e, o = entrance_room_idx, exit_room_idx
+    entrance_x = int(xs[e] + 1 + int(r[3] * (ws[e] - 2)))
+    entrance_y = int(ys[e] + 1 + int(r[4] * (hs[e] - 2)))
     
-    # 방 내부의 랜덤한 위치 선택
-    ex, ey, ew, eh = entrance_room
-    entrance_x = np.random.randint(ex+1, ex+ew-1)
-    entrance_y = np.random.randint(ey+1, ey+eh-1)
-    
-    xx, xy, xw, xh = exit_room
-    exit_x = np.random.randint(xx+1, xx+xw-1)
-    exit_y = np.random.randint(xy+1, xy+xh-1)
+    exit_x = int(xs[o] + 1 + int(r[5] * (ws[o] - 2)))
+    exit_y = int(ys[o] + 1 + int(r[6] * (hs[o] - 2)))
     
     return (entrance_y, entrance_x), (exit_y, exit_x)
 
+def _bfs_flat(walkable, heights, width, start, goal, max_height_diff):
+    """
+    1차원으로 펼친 격자(인덱스 = y*width + x)에서 BFS 수행
+    고정 크기 배열 큐와 부모 인덱스 배열을 사용하므로 numba로 컴파일 가능
+    반환: (부모 인덱스 배열, 방문 여부 배열, 출구 도달 여부)
+    """
+    n = walkable.shape[0]
+    height = n // width
+    queue = np.empty(n, dtype=np.int32)
+    parents = np.full(n, -1, dtype=np.int32)
+    visited = np.zeros(n, dtype=np.bool_)
+    
+    head = 0
+    tail = 0
+    queue[tail] = start
+    tail += 1
+    visited[start] = True
+    
+    while head < tail:
+        c = queue[head]
+        head += 1
+        
+        # 출구에 도달한 경우
+        if c == goal:
+            return parents, visited, True
+        
+        y = c // width
+        x = c - y * width
+        
+        # 인접한 타일로 이동 (상, 하, 좌, 우)
+        for k in range(4):
+            if k == 0:
+                if y == 0:
+                    continue
+                nc = c - width
+            elif k == 1:
+                if y == height - 1:
+                    continue
+                nc = c + width
+            elif k == 2:
+                if x == 0:
+                    continue
+                nc = c - 1
+            else:
+                if x == width - 1:
+                    continue
+                nc = c + 1
+            
+            # 던전 타일이며 아직 방문하지 않았고 높이 차이가 허용 범위인 경우
+            if walkable[nc] and not visited[nc] and abs(heights[nc] - heights[c]) <= max_height_diff:
+                visited[nc] = True
+                parents[nc] = c
+                queue[tail] = nc
+                tail += 1
+    
+    return parents, visited, False
+
+if njit is not None:
+    _bfs_flat = njit(cache=True)(_bfs_flat)
+
+def find_problematic_points(dungeon, height_map, visited, max_height_diff):
+    """
+    방문한 지점과 인접한 방문하지 않은 던전 지점 중 높이 차이가 큰 쌍을 배열 연산으로 찾기
+    반환 형식과 순서는 (y, x) 행 우선 + 상/하/좌/우 순회와 동일: [((y, x), (ny, nx), 높이 차이), ...]
+    """
+    walkable = dungeon == 1
+    heights = height_map.astype(np.int64)
+    
+    parts = []
+    # 세로로 인접한 쌍 (y, x)-(y+1, x)과 가로로 인접한 쌍 (y, x)-(y, x+1)
+    for axis, dir_fwd, dir_back in ((0, 1, 0), (1, 3, 2)):
+        a = (slice(None, -1), slice(None)) if axis == 0 else (slice(None), slice(None, -1))
+        b = (slice(1, None), slice(None)) if axis == 0 else (slice(None), slice(1, None))
+        diff = np.abs(heights[b] - heights[a])
+        mask = walkable[a] & walkable[b] & (visited[a] ^ visited[b]) & (diff > max_height_diff)
+        
+        y1, x1 = np.nonzero(mask)
+        y2, x2 = (y1 + 1, x1) if axis == 0 else (y1, x1 + 1)
+        first_seen = visited[a][mask]
+        
+        # 방문한 쪽을 기준 지점으로, 방향 번호는 directions(상, 하, 좌, 우) 인덱스
+        parts.append(np.stack([
+            np.where(first_seen, y1, y2), np.where(first_seen, x1, x2),
+            np.where(first_seen, y2, y1), np.where(first_seen, x2, x1),
+            diff[mask], np.where(first_seen, dir_fwd, dir_back),
+        ], axis=1))
+    
+    points = np.concatenate(parts)
+    points = points[np.lexsort((points[:, 5], points[:, 1], points[:, 0]))]
+    return [((vy, vx), (ny, nx), d) for vy, vx, ny, nx, d, _ in points.tolist()]
+
+def _bfs_csgraph(dungeon, height_map, start, goal, max_height_diff):
+    """
+    이동 가능한 인접 칸(높이 차이 허용 범위 이내) 사이의 간선으로 희소 그래프를 만든 뒤
+    scipy의 breadth_first_order로 탐색 (격자 인덱스 = y*width + x)
+    반환: (부모 인덱스 배열, 방문 여부 배열) - 시작점과 미방문 칸의 부모는 음수
+    """
+    n = dungeon.size
+    walkable = dungeon == 1
+    heights = height_map.astype(np.int64)
+    idx = np.arange(n).reshape(dungeon.shape)
+    
+    # 세로로 인접한 쌍과 가로로 인접한 쌍 중 둘 다 던전 타일이고 높이 차이가 허용 범위인 것
+    vert = walkable[:-1] & walkable[1:] & (np.abs(heights[1:] - heights[:-1]) <= max_height_diff)
+    horz = walkable[:, :-1] & walkable[:, 1:] & (np.abs(heights[:, 1:] - heights[:, :-1]) <= max_height_diff)
+    rows = np.concatenate([idx[:-1][vert], idx[:, :-1][horz]])
+    cols = np.concatenate([idx[1:][vert], idx[:, 1:][horz]])
+    graph = csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(n, n))
+    
+    order, parents = breadth_first_order(graph, start, directed=False, return_predecessors=True)
+    visited = np.zeros(n, dtype=bool)
+    visited[order] = True
+    return parents, visited
+
 def find_path_bfs(dungeon, height_map, entrance, exit, max_height_diff=3):
     """
     BFS를 사용해 입구에서 출구까지의 경로 찾기
     max_height_diff: 이동 가능한 최대 높이 차이
     """
     height, width = dungeon.shape
-    visited = np.zeros_like(dungeon, dtype=bool)
-    queue = deque([(entrance[0], entrance[1], [])])  # (y, x, path)
-    visited[entrance[0], entrance[1]] = True
     
     # 이동 방향 (상, 하, 좌, 우)
     directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
     
-    while queue:
-        y, x, path = queue.popleft()
-        current_path = path + [(y, x)]
+    if njit is not None:
+        # numba 컴파일된 BFS 사용 후 부모 인덱스를 따라 경로 복원
+        start = entrance[0] * width + entrance[1]
+        goal = exit[0] * width + exit[1]
+        parents, visited_flat, found = _bfs_flat(
+            np.ascontiguousarray(dungeon == 1).ravel(),
+            np.ascontiguousarray(height_map).ravel(),
+            width, start, goal, max_height_diff)
         
-        # 출구에 도달한 경우
-        if (y, x) == exit:
-            return current_path, None  # 경로 반환, 문제 지점 없음
+        if found:
+            path = []
+            c = goal
+            while c != -1:
+                path.append(divmod(int(c), width))
+                c = parents[c]
+            path.reverse()
+            return path, None  # 경로 반환, 문제 지점 없음
+        
+        visited = visited_flat.reshape(height, width)
+    elif csr_matrix is not None:
+        # scipy 희소 그래프 BFS 사용 후 부모 인덱스를 따라 경로 복원
+        start = entrance[0] * width + entrance[1]
+        goal = exit[0] * width + exit[1]
+        parents, visited_flat = _bfs_csgraph(dungeon, height_map, start, goal, max_height_diff)
+        
+        if visited_flat[goal]:
+            path = []
+            c = goal
+            while c >= 0:
+                path.append(divmod(int(c), width))
+                c = parents[c]
+            path.reverse()
+            return path, None  # 경로 반환, 문제 지점 없음
         
-        # 인접한 타일로 이동
-        for dy, dx in directions:
-            ny, nx = y + dy, x + dx
+        visited = visited_flat.reshape(height, width)
+    else:
+        visited = np.zeros_like(dungeon, dtype=bool)
+        # 큐에는 좌표만 넣고, 경로는 부모 좌표 테이블로 마지막에 한 번만 복원
+        parent = np.full((height, width, 2), -1, dtype=np.int16)
+        queue = deque([entrance])
+        visited[entrance[0], entrance[1]] = True
+        
+        while queue:
+            y, x = queue.popleft()
             
-            # 맵 범위 내이고 던전 타일이며 아직 방문하지 않은 경우
-            if (0 <= ny < height and 0 <= nx < width and 
-                dungeon[ny, nx] == 1 and not visited[ny, nx]):
-                
-                # 높이 차이 계산
-                height_diff = abs(height_map[ny, nx] - height_map[y, x])
+            # 출구에 도달한 경우
+            if (y, x) == exit:
+                path = []
+                cur = (y, x)
+                while cur != (-1, -1):
+                    path.append(cur)
+                    cur = tuple(int(v) for v in parent[cur])
+                path.reverse()
+                return path, None  # 경로 반환, 문제 지점 없음
+            
+            # 인접한 타일로 이동
+            for dy, dx in directions:
+                ny, nx = y + dy, x + dx
                 
-                # 높이 차이가 너무 크면 이동 불가
-                if height_diff <= max_height_diff:
-                    visited[ny, nx] = True
-                    queue.append((ny, nx, current_path))
+                # 맵 범위 내이고 던전 타일이며 아직 방문하지 않은 경우
+                if (0 <= ny < height and 0 <= nx < width and 
+                    dungeon[ny, nx] == 1 and not visited[ny, nx]):
+                    
+                    # 높이 차이 계산
+                    height_diff = abs(height_map[ny, nx] - height_map[y, x])
+                    
+                    # 높이 차이가 너무 크면 이동 불가
+                    if height_diff <= max_height_diff:
+                        visited[ny, nx] = True
+                        parent[ny, nx] = (y, x)
+                        queue.append((ny, nx))
     
     # 경로를 찾지 못한 경우, 높이 차이가 큰 문제 지점 찾기
-    problematic_points = []
-    # 방문한 모든 지점에서 인접한 방문하지 않은 지점 중 높이 차이가 큰 지점 찾기
-    for y in range(height):
-        for x in range(width):
-            if visited[y, x] and dungeon[y, x] == 1:
-                for dy, dx in directions:
-                    ny, nx = y + dy, x + dx
-                    if (0 <= ny < height and 0 <= nx < width and 
-                        dungeon[ny, nx] == 1 and not visited[ny, nx]):
-                        
-                        height_diff = abs(height_map[ny, nx] - height_map[y, x])
-                        if height_diff > max_height_diff:
-                            problematic_points.append(((y, x), (ny, nx), height_diff))
+    problematic_points = find_problematic_points(dungeon, height_map, visited, max_height_diff)
     
     return None, problematic_points  # 경로 없음, 문제 지점 반환
 
@@ -215,198 +424,367 @@ def adjust_heights_for_path(dungeon, height_map, problematic_points, max_height_
     """높이 차이가 큰 문제 지점들의 높이 조정"""
     print(f"높이 차이가 너무 큰 {len(problematic_points)}개의 지점 조정 중...")
     
-    for (y1, x1), (y2, x2), height_diff in problematic_points:
-        # 두 타일의 현재 높이
-        h1 = height_map[y1, x1]
-        h2 = height_map[y2, x2]
-        
-        # 높이 차이가 max_height_diff보다 큰 경우 조정
-        if height_diff > max_height_diff:
-            # 낮은 쪽을 높이기, 높은 쪽을 낮추기 병행
-            target_diff = max_height_diff
-            if h1 < h2:
-                # h1을 조금 높이고, h2를 조금 낮춤
-                new_h1 = h1 + (height_diff - target_diff) // 2
-                new_h2 = h2 - (height_diff - target_diff) // 2
-            else:
-                # h2를 조금 높이고, h1을 조금 낮춤
-                new_h2 = h2 + (height_diff - target_diff) // 2
-                new_h1 = h1 - (height_diff - target_diff) // 2
-            
-            height_map[y1, x1] = max(1, new_h1)  # 최소 높이는 1
-            height_map[y2, x2] = max(1, new_h2)
-            
-            print(f"  지점 ({y1},{x1})와 ({y2},{x2}) 사이의 높이 차이 {height_diff}를 {abs(height_map[y1, x1] - height_map[y2, x2])}로 조정")
+    # [((y1, x1), (y2, x2), 높이 차이), ...] -> 열 배열로 변환
+    points = np.array([(y1, x1, y2, x2, d) for (y1, x1), (y2, x2), d in problematic_points], dtype=np.int64).reshape(-1, 5)
+    # 높이 차이가 max_height_diff보다 큰 경우만 조정
+    points = points[points[:, 4] > max_height_diff]
+    if len(points) == 0:
+        return height_map
+    
+    p1 = (points[:, 0], points[:, 1])
+    p2 = (points[:, 2], points[:, 3])
+    h1 = height_map[p1]
+    h2 = height_map[p2]
+    
+    # 낮은 쪽을 높이기, 높은 쪽을 낮추기 병행
+    delta = (points[:, 4] - max_height_diff) // 2
+    step = np.where(h1 < h2, delta, -delta)
+    height_map[p1] = np.maximum(1, h1 + step)  # 최소 높이는 1
+    height_map[p2] = np.maximum(1, h2 - step)
+    
+    after = np.abs(height_map[p1].astype(np.int64) - height_map[p2])
+    print(f"  {len(points)}개 지점 쌍의 최대 높이 차이 {points[:, 4].max()}를 {after.max()}로 조정")
     
     return height_map
 
+def _minimax_csgraph(dungeon, height_map, start, goal):
+    """
+    이동 가능한 인접 칸 사이의 간선(높이 차이 포함)을 한 번만 만든 뒤, 입구와 출구를 잇는
+    가장 작은 높이 차이 한도를 이분 탐색으로 찾아 그 한도 이하 간선만으로 scipy BFS 수행
+    (격자 인덱스 = y*width + x, 같은 한도 안에서는 BFS라 가장 짧은 경로)
+    반환: (부모 인덱스 배열, 경로 위 최대 높이 차이) 또는 연결되지 않으면 (None, None)
+    """
+    n = dungeon.size
+    walkable = dungeon == 1
+    heights = height_map.astype(np.int64)
+    idx = np.arange(n).reshape(dungeon.shape)
+    
+    # 세로로 인접한 쌍과 가로로 인접한 쌍 중 둘 다 던전 타일인 것
+    vert = walkable[:-1] & walkable[1:]
+    horz = walkable[:, :-1] & walkable[:, 1:]
+    rows = np.concatenate([idx[:-1][vert], idx[:, :-1][horz]])
+    cols = np.concatenate([idx[1:][vert], idx[:, 1:][horz]])
+    diffs = np.concatenate([np.abs(heights[1:] - heights[:-1])[vert],
+                            np.abs(heights[:, 1:] - heights[:, :-1])[horz]])
+    
+    def search(limit):
+        keep = diffs <= limit
+        graph = csr_matrix((np.ones(np.count_nonzero(keep), dtype=np.int8), (rows[keep], cols[keep])), shape=(n, n))
+        _, parents = breadth_first_order(graph, start, directed=False, return_predecessors=True)
+        return parents
+    
+    # 후보 한도는 실제 간선의 높이 차이 값들뿐 - 모든 간선을 써도 닿지 않으면 연결되지 않은 것
+    levels = np.unique(diffs)
+    if len(levels) == 0:
+        return None, None
+    parents = search(levels[-1])
+    if parents[goal] < 0:
+        return None, None
+    
+    lo, hi = 0, len(levels) - 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        candidate = search(levels[mid])
+        if candidate[goal] >= 0:
+            hi, parents = mid, candidate
+        else:
+            lo = mid + 1
+    return parents, int(levels[hi])
+
+def find_path_minimax(dungeon, height_map, entrance, exit):
+    """
+    '경로 위 최대 높이 차이'가 가장 작은 경로(병목 최단 경로) 찾기
+    최대 높이 차이가 같은 경로 중에서는 가장 짧은 경로를 반환
+    scipy가 있으면 csgraph 한도 이분 탐색, 없으면 다익스트라로 병목 값을 구한 뒤 그 한도로 BFS
+    반환: (경로 또는 None, 경로 위 최대 높이 차이)
+    """
+    height, width = dungeon.shape
+    
+    if csr_matrix is not None and tuple(entrance) != tuple(exit):
+        # scipy 희소 그래프로 한도를 찾은 뒤 부모 인덱스를 따라 경로 복원
+        parents, max_diff = _minimax_csgraph(dungeon, height_map, entrance[0] * width + entrance[1],
+                                             exit[0] * width + exit[1])
+        if parents is None:
+            return None, None
+        path = []
+        c = exit[0] * width + exit[1]
+        while c >= 0:
+            path.append(divmod(int(c), width))
+            c = parents[c]
+        path.reverse()
+        return path, max_diff
+    
+    # 1단계: 다익스트라로 출구까지의 가장 작은 최대 높이 차이(병목 값)만 구하기
+    walkable = dungeon == 1
+    heights = height_map.tolist()
+    
+    best = np.full((height, width), np.iinfo(np.int64).max, dtype=np.int64)
+    ey, ex = entrance
+    best[ey, ex] = 0
+    heap = [(0, ey, ex)]
+    
+    while heap:
+        bottleneck, y, x = heapq.heappop(heap)
+        if bottleneck > best[y, x]:
+            continue  # 이미 더 작은 병목 값으로 처리된 지점
+        
+        # 출구에 도달한 경우 - 2단계: 병목 값 이하 간선만으로 BFS 해서 가장 짧은 경로 복원
+        if (y, x) == exit:
+            path, _ = find_path_bfs(dungeon, height_map, entrance, exit, max_height_diff=bottleneck)
+            return path, bottleneck
+        
+        h = heights[y][x]
+        # 인접한 타일로 이동 (상, 하, 좌, 우)
+        for ny, nx in ((y - 1, x), (y + 1, x), (y, x - 1), (y, x + 1)):
+            if 0 <= ny < height and 0 <= nx < width and walkable[ny, nx]:
+                new_bottleneck = max(bottleneck, abs(heights[ny][nx] - h))
+                if new_bottleneck < best[ny, nx]:
+                    best[ny, nx] = new_bottleneck
+                    heapq.heappush(heap, (new_bottleneck, ny, nx))
+    
+    return None, None  # 던전 타일로 연결되어 있지 않음
+
+def flatten_path_heights(height_map, path, max_height_diff=3):
+    """경로를 따라가며 다음 칸의 높이를 이전 칸 기준 허용 범위 안으로 맞추기 (경로 위 칸만 수정)"""
+    adjusted = 0
+    for (y1, x1), (y2, x2) in zip(path, path[1:]):
+        h1, h2 = int(height_map[y1, x1]), int(height_map[y2, x2])
+        if h2 > h1 + max_height_diff:
+            height_map[y2, x2] = h1 + max_height_diff
+            adjusted += 1
+        elif h2 < h1 - max_height_diff:
+            height_map[y2, x2] = h1 - max_height_diff
+            adjusted += 1
+    return adjusted
+
 def ensure_path_exists(dungeon, height_map, entrance, exit, max_attempts=5, max_height_diff=3):
-    """입구에서 출구까지 경로가 존재하도록 높이 조정"""
+    """
+    입구에서 출구까지 경로가 존재하도록 높이 조정
+    최대 높이 차이가 가장 작은 경로를 한 번에 찾고, 허용 범위를 넘으면 그 경로 위의 높이만 조정
+    조정 후에는 다시 탐색해 허용 범위 안의 경로인지 확인 (탐색은 최대 max_attempts번)
+    """
+    print("경로 확인 중...")
     for attempt in range(max_attempts):
-        print(f"경로 확인 시도 #{attempt+1}...")
-        path, problematic_points = find_path_bfs(dungeon, height_map, entrance, exit, max_height_diff)
+        path, max_diff = find_path_minimax(dungeon, height_map, entrance, exit)
+        
+        if path is None:
+            print("던전 타일로 연결되어 있지 않아 경로를 찾을 수 없습니다.")
+            return height_map, None
         
-        if path:
+        if max_diff <= max_height_diff:
             print(f"입구에서 출구까지 경로를 찾았습니다! (길이: {len(path)})")
             return height_map, path
         
-        if problematic_points:
-            print(f"경로가 없습니다. 높이 조정 시도...")
-            height_map = adjust_heights_for_path(dungeon, height_map, problematic_points, max_height_diff)
-        else:
-            print("경로를 찾을 수 없고 조정할 지점도 없습니다.")
-            break
+        print(f"시도 {attempt + 1}/{max_attempts}: 경로 위 최대 높이 차이 {max_diff}가 허용치 {max_height_diff}를 넘습니다. 경로 높이 조정...")
+        adjusted = flatten_path_heights(height_map, path, max_height_diff)
+        print(f"  경로 위 {adjusted}개 지점 높이 조정 완료")
     
-    # 마지막 시도
-    path, _ = find_path_bfs(dungeon, height_map, entrance, exit, max_height_diff)
-    if path:
-        print("높이 조정 후 경로를 찾았습니다!")
-        return height_map, path
-    else:
-        print("모든 시도 후에도 경로를 찾을 수 없습니다.")
-        return height_map, None
-
-# 랜덤 시드 제거 - 매번 다른 던전 생성
-# np.random.seed(42)
-
-# 던전과 높이 맵 생성
-width, height = 60, 50  # 더 넓은 공간으로 확장
-dungeon, rooms = generate_dungeon(width, height, room_count=6, min_room_distance=3)  # 방 수 감소, 간격 설정
-height_map = generate_height_map(dungeon, rooms, max_height=12)
-
-# 입구와 출구 선택
-entrance, exit = select_entrance_exit(dungeon, rooms)
-print(f"입구 위치: {entrance}")
-print(f"출구 위치: {exit}")
-
-# 경로 확인 및 필요시 높이 조정
-height_map, path = ensure_path_exists(dungeon, height_map, entrance, exit)
-
-# 아이소메트릭 투영 파라미터
-tile_width, tile_height = 1.5, 0.75  # 타일 크기 증가
-height_scale = 0.5  # 높이 스케일 증가
-
-# 그림 그리기
-fig, ax = plt.subplots(figsize=(16, 12), dpi=100)
-ax.set_aspect('equal')
-ax.axis('off')
-
-# ============================== 바닥면 색상 설정 =================================
-# 맵 바닥 - 여기서 색상을 변경하면 맵 전체 바닥(던전 타일이 그려질 배경)의 색상이 변경됩니다.
-# alpha: 투명도 (0.0: 완전 투명, 1.0: 완전 불투명)
-# facecolor: 바닥면 색상 ('lightgray'는 연한 회색, RGB Hex 코드로 '#333333'은 어두운 회색)
-# edgecolor: 바닥면 테두리 색상
-floor_poly = Polygon([
-    (-width * tile_width/2, height * tile_height/2),
-    (0, 0),
-    (width * tile_width/2, height * tile_height/2),
-    (0, height * tile_height)
-], closed=True, alpha=0.2, facecolor='lightgray', edgecolor='gray')
-ax.add_patch(floor_poly)
-# ==============================================================================
-
-# 커스텀 컬러맵 생성 (더 선명한 대비)
-# 타일의 높이에 따른 색상 그라데이션을 정의합니다.
-# 첫 번째 색상(파란색 계열)이 낮은 높이, 마지막 색상(주황색 계열)이 높은 높이입니다.
-colors = [(0.2, 0.5, 0.7), (0.3, 0.7, 0.3), (0.7, 0.8, 0.2), (0.8, 0.4, 0.2)]
-cmap = LinearSegmentedColormap.from_list('custom_terrain', colors, N=256)
-
-# 정렬 순서를 위해 좌표와 높이 리스트 만들기
-tiles = []
-for y in range(height):
-    for x in range(width):
-        if dungeon[y, x] == 1:
-            h = height_map[y, x]
-            iso_x = (x - y) * tile_width / 2
-            iso_y = (x + y) * tile_height / 2
-            tiles.append((x, y, h, iso_x, iso_y))
-
-# 뒤에서 앞으로 그리기 위해 정렬 (먼 타일부터 그리기)
-tiles.sort(key=lambda t: (t[0] + t[1], -t[2]))
-
-# 경로 좌표들을 집합으로 변환 (빠른 검색을 위해)
-path_set = set()
-if path:
-    path_set = set(path)
-
-# 타일 그리기
-for x, y, h, iso_x, iso_y in tiles:
-    # 높이에 따른 색상
-    normalized_height = h / max(1, height_map.max())
-    color = cmap(normalized_height)  # 타일 상단 색상은 높이에 따라 자동으로 결정됩니다
-    
-    # 타일 윗면
-    top_y = iso_y - h * height_scale  # 높이 적용
-    
-    top = (iso_x, top_y)
-    right = (iso_x + tile_width/2, top_y + tile_height/2)
-    bottom = (iso_x, top_y + tile_height)
-    left = (iso_x - tile_width/2, top_y + tile_height/2)
+    print(f"{max_attempts}번 시도 후에도 허용 범위 안의 경로를 찾을 수 없습니다.")
+    return height_map, None
+
+def rasterize_tiles(iso_xs, iso_ys, heights, facecolors, tile_width, tile_height, height_scale, px_per_unit=16):
+    """
+    미리보기용 빠른 렌더링: 타일 기둥(왼쪽 면, 오른쪽 면, 윗면)을 픽셀 버퍼에 한 번에 찍기
+    iso_xs, iso_ys, heights는 그리는 순서(뒤 -> 앞)대로 정렬되어 있어야 하며
+    facecolors는 타일마다 [왼쪽 면, 오른쪽 면, 윗면] 순서의 RGBA 배열 (N*3, 4)
+    같은 픽셀에 여러 면이 겹치면 나중에 그리는 면이 이김 (벡터 출력과 같은 덧그리기 순서)
+    반환: (RGBA 이미지, imshow용 extent)
+    """
+    iso_xs = np.asarray(iso_xs, dtype=float)
+    iso_ys = np.asarray(iso_ys, dtype=float)
+    side_px = np.asarray(heights, dtype=float) * height_scale * px_per_unit  # 측면 높이 (픽셀)
+    top_ys = iso_ys - side_px / px_per_unit
     
-    # ========================= 타일의 측면 색상 설정 ===========================
-    # 측면 그리기 (항상 그림)
-    # 왼쪽 면 - 타일의 윗면 색상에서 어둡게 변형한 색상 (원래 색상의 60%)
-    left_side = [
-        left,
-        (left[0], iso_y + tile_height/2),  # 바닥 높이
-        (iso_x, iso_y + tile_height),      # 바닥 높이
-        bottom
-    ]
-    left_poly = Polygon(left_side, closed=True)
-    ax.add_patch(left_poly)
-    left_poly.set_facecolor(tuple(c*0.4 for c in color[:3]) + (color[3],))  # 어둡게
-    left_poly.set_edgecolor('white')
-    left_poly.set_linewidth(0.5)
-    
-    # 오른쪽 면 - 타일의 윗면 색상에서 약간 어둡게 변형한 색상 (원래 색상의 80%)
-    right_side = [
-        bottom,
-        (iso_x, iso_y + tile_height),      # 바닥 높이
-        (right[0], iso_y + tile_height/2), # 바닥 높이
-        right
-    ]
-    right_poly = Polygon(right_side, closed=True)
-    ax.add_patch(right_poly)
-    right_poly.set_facecolor(tuple(c*0.6 for c in color[:3]) + (color[3],))  # 약간 어둡게
-    right_poly.set_edgecolor('lightgray')
-    right_poly.set_linewidth(0.5)
-    # ==========================================================================
+    tw = int(round(tile_width * px_per_unit))
+    th = int(round(tile_height * px_per_unit))
+    max_side = int(np.ceil(side_px.max())) if len(side_px) else 0
+    
+    # 타일 하나의 템플릿 (윗 꼭짓점 기준 픽셀 중심 좌표): 면 번호와 마름모 아래 변에서의 깊이
+    v, u = np.mgrid[0:th + max_side + 1, 0:tw] + 0.5
+    u = u - tw / 2
+    is_top = np.abs(u) / (tw / 2) + np.abs(v - th / 2) / (th / 2) <= 1
+    lower_edge = th / 2 + (tw / 2 - np.abs(u)) * th / tw
+    depth = np.where(is_top, -1.0, v - lower_edge)
+    inside = is_top | (v > lower_edge)
+    tmpl_r, tmpl_c = np.nonzero(inside)
+    tmpl_depth = depth[inside]
+    tmpl_face = np.where(is_top[inside], 2, (u[inside] > 0).astype(int))  # 0: 왼쪽, 1: 오른쪽, 2: 윗면
+    
+    # 캔버스 범위 (데이터 좌표)
+    x_min = iso_xs.min() - tile_width / 2
+    y_min = top_ys.min()
+    width_px = int(np.ceil((iso_xs.max() + tile_width / 2 - x_min) * px_per_unit))
+    height_px = int(np.ceil((iso_ys.max() + tile_height - y_min) * px_per_unit)) + 1
+    col0 = np.round((iso_xs - tile_width / 2 - x_min) * px_per_unit).astype(np.int64)
+    row0 = np.round((top_ys - y_min) * px_per_unit).astype(np.int64)
     
+    # 타일마다 자기 측면 높이까지만 템플릿 픽셀 사용
+    ti, pi = np.nonzero(tmpl_depth[None, :] <= side_px[:, None])
+    rows = np.minimum(row0[ti] + tmpl_r[pi], height_px - 1)
+    cols = np.minimum(col0[ti] + tmpl_c[pi], width_px - 1)
+    
+    # 픽셀마다 가장 나중에 그려지는 면 번호만 남기기 (z-버퍼)
+    zbuf = np.full((height_px, width_px), -1, dtype=np.int64)
+    np.maximum.at(zbuf, (rows, cols), ti * 3 + tmpl_face[pi])
+    
+    img = np.zeros((height_px, width_px, 4))  # 배경은 투명
+    filled = zbuf >= 0
+    img[filled] = facecolors[zbuf[filled]]
+    
+    extent = (x_min, x_min + width_px / px_per_unit, y_min, y_min + height_px / px_per_unit)
+    return img, extent
+
+def main(vector_output=True):
+    """
+    던전 생성부터 렌더링까지 실행 (모듈을 import만 할 때는 실행되지 않음)
+    vector_output - True: 타일을 벡터 다각형으로 그림 (최종 PNG용)
+                    False: 픽셀 버퍼에 래스터로 찍어 imshow로 표시 (생성 파라미터 조정 중 빠른 미리보기용, 테두리 선 없음)
+    """
+    # 랜덤 시드 제거 - 매번 다른 던전 생성
+    # np.random.seed(42)
+
+    # 던전과 높이 맵 생성
+    width, height = 60, 50  # 더 넓은 공간으로 확장
+    dungeon, rooms = generate_dungeon(width, height, room_count=6, min_room_distance=3)  # 방 수 감소, 간격 설정
+    height_map = generate_height_map(dungeon, rooms, max_height=12)
+
+    # 입구와 출구 선택
+    entrance, exit = select_entrance_exit(dungeon, rooms)
+    print(f"입구 위치: {entrance}")
+    print(f"출구 위치: {exit}")
+
+    # 경로 확인 및 필요시 높이 조정
+    height_map, path = ensure_path_exists(dungeon, height_map, entrance, exit)
+
+    # 아이소메트릭 투영 파라미터
+    tile_width, tile_height = 1.5, 0.75  # 타일 크기 증가
+    height_scale = 0.5  # 높이 스케일 증가
+
+    # 그림 그리기
+    fig, ax = plt.subplots(figsize=(16, 12), dpi=100)
+    ax.set_aspect('equal')
+    ax.axis('off')
+
+    # ============================== 바닥면 색상 설정 =================================
+    # 맵 바닥 - 여기서 색상을 변경하면 맵 전체 바닥(던전 타일이 그려질 배경)의 색상이 변경됩니다.
+    # alpha: 투명도 (0.0: 완전 투명, 1.0: 완전 불투명)
+    # facecolor: 바닥면 색상 ('lightgray'는 연한 회색, RGB Hex 코드로 '#333333'은 어두운 회색)
+    # edgecolor: 바닥면 테두리 색상
+    floor_poly = Polygon([
+        (-width * tile_width/2, height * tile_height/2),
+        (0, 0),
+        (width * tile_width/2, height * tile_height/2),
+        (0, height * tile_height)
+    ], closed=True, alpha=0.2, facecolor='lightgray', edgecolor='gray')
+    ax.add_patch(floor_poly)
+    # ==============================================================================
+
+    # 커스텀 컬러맵 생성 (더 선명한 대비)
+    # 타일의 높이에 따른 색상 그라데이션을 정의합니다.
+    # 첫 번째 색상(파란색 계열)이 낮은 높이, 마지막 색상(주황색 계열)이 높은 높이입니다.
+    colors = [(0.2, 0.5, 0.7), (0.3, 0.7, 0.3), (0.7, 0.8, 0.2), (0.8, 0.4, 0.2)]
+    cmap = LinearSegmentedColormap.from_list('custom_terrain', colors, N=256)
+
+    # 정렬 순서를 위해 좌표와 높이 배열 만들기 (던전 타일만, 행 우선 순서)
+    tile_ys, tile_xs = np.nonzero(dungeon == 1)
+    tile_hs = height_map[tile_ys, tile_xs]
+    tile_iso_xs = (tile_xs - tile_ys) * tile_width / 2
+    tile_iso_ys = (tile_xs + tile_ys) * tile_height / 2
+
+    # 뒤에서 앞으로 그리기 위해 정렬 (먼 타일부터 그리기) - 키: (x + y, -높이), 안정 정렬
+    order = np.lexsort((-tile_hs.astype(np.int64), tile_xs + tile_ys))
+    tiles = list(zip(tile_xs[order].tolist(), tile_ys[order].tolist(), tile_hs[order].tolist(),
+                     tile_iso_xs[order].tolist(), tile_iso_ys[order].tolist()))
+
+    # 경로 좌표들을 불리언 마스크로 변환 (타일마다 배열 조회 한 번으로 확인)
+    path_mask = np.zeros(dungeon.shape, dtype=bool)
+    if path:
+        path_mask[tuple(np.array(path).T)] = True
+
+    # 높이에 따른 색상 - 정렬된 모든 타일을 컬러맵에 한 번에 넣어 (N, 4) RGBA 배열로 계산
+    # 타일 상단 색상은 높이에 따라 자동으로 결정됩니다 (낮음: 파란색 계열, 높음: 주황색 계열)
+    max_h_val = max(1, height_map.max())  # 0으로 나누기 방지
+    sorted_ys, sorted_xs = tile_ys[order], tile_xs[order]
+    base_colors = cmap(tile_hs[order] / max_h_val)
+
+    # 경로, 입구, 출구 여부 (타일별 불리언 배열)
+    is_entrance = (sorted_ys == entrance[0]) & (sorted_xs == entrance[1])
+    is_exit = (sorted_ys == exit[0]) & (sorted_xs == exit[1])
+    is_path = path_mask[sorted_ys, sorted_xs]
+
     # ========================= 타일의 윗면 색상 설정 ===========================
-    # 윗면 그리기 (마지막에 그려서 겹치도록)
-    # 타일의 윗면 색상은 높이에 따라 자동으로 결정됨 (낮음: 파란색 계열, 높음: 주황색 계열)
-    
-    # 경로, 입구, 출구 여부에 따라 타일 색상 조정
-    if (y, x) == entrance:
-        tile_color = 'green'  # 입구는 초록색
-        tile_edge = 'black'
-        linewidth = 1.5
-    elif (y, x) == exit:
-        tile_color = 'red'  # 출구는 빨간색
-        tile_edge = 'black'
-        linewidth = 1.5
-    elif path and (y, x) in path_set:
-        tile_color = 'yellow'  # 경로는 노란색
-        tile_edge = 'black'
-        linewidth = 0.7
-    else:
-        tile_color = color
-        tile_edge = 'black'
-        linewidth = 0.5
-    
-    top_poly = Polygon([top, right, bottom, left], closed=True)
-    ax.add_patch(top_poly)
-    top_poly.set_facecolor(tile_color)
-    top_poly.set_edgecolor(tile_edge)
-    top_poly.set_linewidth(linewidth)
+    # 경로, 입구, 출구 여부에 따라 타일 색상 조정 (입구 > 출구 > 경로 > 높이 색상 우선순위)
+    top_colors = np.where(is_entrance[:, None], to_rgba_array('green'),  # 입구는 초록색
+                 np.where(is_exit[:, None], to_rgba_array('red'),        # 출구는 빨간색
+                 np.where(is_path[:, None], to_rgba_array('yellow'),     # 경로는 노란색
+                          base_colors)))
+    top_linewidths = np.where(is_entrance | is_exit, 1.5, np.where(is_path, 0.7, 0.5))
     # ==========================================================================
 
-# 축 범위 자동 설정
-ax.autoscale_view()
-        
-# 제목 설정
-ax.set_title('Quarter View Dungeon Map with Entrance/Exit', fontsize=16, pad=20)
+    # 타일 그리기 - 모든 면을 그리는 순서대로 모아 PolyCollection 하나로 추가
+    # (타일마다 왼쪽 면, 오른쪽 면, 윗면 순서를 유지하므로 겹침 결과는 개별 Polygon과 같음)
+    poly_verts = []
+    for x, y, h, iso_x, iso_y in tiles:
+        # 타일 윗면
+        top_y = iso_y - h * height_scale  # 높이 적용
+
+        top = (iso_x, top_y)
+        right = (iso_x + tile_width/2, top_y + tile_height/2)
+        bottom = (iso_x, top_y + tile_height)
+        left = (iso_x - tile_width/2, top_y + tile_height/2)
+
+        # 측면 그리기 (항상 그림) - 왼쪽 면, 오른쪽 면
+        left_side = [
+            left,
+            (left[0], iso_y + tile_height/2),  # 바닥 높이
+            (iso_x, iso_y + tile_height),      # 바닥 높이
+            bottom
+        ]
+        right_side = [
+            bottom,
+            (iso_x, iso_y + tile_height),      # 바닥 높이
+            (right[0], iso_y + tile_height/2), # 바닥 높이
+            right
+        ]
+        # 윗면 그리기 (마지막에 그려서 겹치도록)
+        poly_verts.extend((left_side, right_side, [top, right, bottom, left]))
+
+    # ========================= 타일의 측면 색상 설정 ===========================
+    # 면 색상: 타일마다 [왼쪽 면, 오른쪽 면, 윗면] 순서
+    # 측면은 윗면 높이 색상의 RGB에 배율을 곱해 어둡게 (알파는 유지)
+    n_tiles = len(base_colors)
+    poly_facecolors = np.empty((n_tiles * 3, 4))
+    poly_facecolors[0::3] = base_colors * (0.4, 0.4, 0.4, 1.0)  # 왼쪽 면 - 어둡게
+    poly_facecolors[1::3] = base_colors * (0.6, 0.6, 0.6, 1.0)  # 오른쪽 면 - 약간 어둡게
+    poly_facecolors[2::3] = top_colors
+
+    # 테두리: 왼쪽 면은 흰색, 오른쪽 면은 연회색, 윗면은 검은색
+    poly_edgecolors = np.empty((n_tiles * 3, 4))
+    poly_edgecolors[0::3] = to_rgba_array('white')
+    poly_edgecolors[1::3] = to_rgba_array('lightgray')
+    poly_edgecolors[2::3] = to_rgba_array('black')
+    poly_linewidths = np.full(n_tiles * 3, 0.5)
+    poly_linewidths[2::3] = top_linewidths
+    # ==========================================================================
+
+    if vector_output:
+        ax.add_collection(PolyCollection(poly_verts, closed=True, facecolors=poly_facecolors,
+                                         edgecolors=poly_edgecolors, linewidths=poly_linewidths))
+    else:
+        preview_img, preview_extent = rasterize_tiles(tile_iso_xs[order], tile_iso_ys[order], tile_hs[order],
+                                                      poly_facecolors, tile_width, tile_height, height_scale)
+        # 바닥면 패치(zorder 1) 위에 그려지도록 같은 zorder 지정
+        ax.imshow(preview_img, extent=preview_extent, origin='lower', interpolation='nearest', zorder=1)
+
+    # 축 범위 자동 설정
+    ax.autoscale_view()
+
+    # 제목 설정
+    ax.set_title('Quarter View Dungeon Map with Entrance/Exit', fontsize=16, pad=20)
+
+    plt.tight_layout()
+    plt.savefig('dungeon_map.png', dpi=120, bbox_inches='tight')
+    plt.show()
 
-plt.tight_layout()
-plt.savefig('dungeon_map.png', dpi=120, bbox_inches='tight')
-plt.show() 
\ No newline at end of file
+if __name__ == "__main__":
+    main()
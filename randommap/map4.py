@@ -1,191 +1,214 @@
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.patches import Polygon
-from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.collections import PolyCollection
+from matplotlib.colors import LinearSegmentedColormap, to_rgba_array
 import matplotlib as mpl
 import heapq
 from collections import deque
-import itertools  # 방 연결 시 조합 사용
+
+# numba가 설치되어 있으면 BFS를 네이티브 코드로 컴파일해서 사용
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# scipy가 있으면 노이즈 평활화를 컴파일된 합성곱으로 처리
+try:
+    from scipy.ndimage import convolve
+except ImportError:
+    convolve = None
+
+# scipy가 있으면 방 연결 MST를 컴파일된 minimum_spanning_tree로 계산 (없으면 힙 기반 프림 사용)
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import minimum_spanning_tree
+except ImportError:
+    minimum_spanning_tree = None
+
+# 상하좌우+자기 자신 5점 평균 커널
+SMOOTH_KERNEL = np.array([[0, 1, 0],
+                          [1, 1, 1],
+                          [0, 1, 0]]) / 5
 
 # 폰트 설정 (한글 표시)
 plt.rcParams['font.family'] = 'Malgun Gothic'
 plt.rcParams['axes.unicode_minus'] = False
 
+def carve_vertical(dungeon, points, x, y_a, y_b, corridor_width):
+    """x열부터 corridor_width칸 너비로 y_a~y_b 구간에 수직 복도를 파고 좌표를 points에 추가"""
+    height, width = dungeon.shape
+    # 맵 범위로 잘라낸 구간을 슬라이스 대입 한 번으로 채우기
+    y_lo, y_hi = max(0, min(y_a, y_b)), min(height, max(y_a, y_b) + 1)
+    x_lo, x_hi = max(0, x), min(width, x + corridor_width)
+    if y_lo >= y_hi or x_lo >= x_hi:
+        return
+    dungeon[y_lo:y_hi, x_lo:x_hi] = 1
+    # 좌표는 (y, 너비 방향 오프셋) 순서로 기록
+    ys, xs = np.mgrid[y_lo:y_hi, x_lo:x_hi]
+    points.extend(zip(ys.ravel().tolist(), xs.ravel().tolist()))
+
+def carve_horizontal(dungeon, points, y, x_a, x_b, corridor_width):
+    """y행부터 corridor_width칸 너비로 x_a~x_b 구간에 수평 복도를 파고 좌표를 points에 추가"""
+    height, width = dungeon.shape
+    # 맵 범위로 잘라낸 구간을 슬라이스 대입 한 번으로 채우기
+    x_lo, x_hi = max(0, min(x_a, x_b)), min(width, max(x_a, x_b) + 1)
+    y_lo, y_hi = max(0, y), min(height, y + corridor_width)
+    if y_lo >= y_hi or x_lo >= x_hi:
+        return
+    dungeon[y_lo:y_hi, x_lo:x_hi] = 1
+    # 좌표는 (x, 너비 방향 오프셋) 순서로 기록
+    xs, ys = np.mgrid[x_lo:x_hi, y_lo:y_hi]
+    points.extend(zip(ys.ravel().tolist(), xs.ravel().tolist()))
+
+def carve_corridor(dungeon, center1, center2, corridor_width, rolls, allow_z=True):
+    """
+    두 방 중심 (x, y)를 L자 또는 Z자 복도로 연결하고 복도 타일 좌표 리스트 반환
+    rolls: 미리 뽑아 둔 [0, 1) 난수 4개 (L/Z 선택, L자 방향, Z자 중간 x, Z자 중간 y)
+    allow_z=False이면 항상 L자 (곁가지용)
+    """
+    x1, y1 = center1
+    x2, y2 = center2
+    shape_roll, dir_roll, mid_x_roll, mid_y_roll = rolls
+    
+    points = [] # 현재 복도의 타일 좌표
+    
+    # 복도 생성 (L자 또는 Z자 형태 추가)
+    if not allow_z or shape_roll < 0.7: # L자 복도 확률 증가
+        # 수직 후 수평 또는 수평 후 수직 (L자)
+        if dir_roll < 0.5:
+            carve_vertical(dungeon, points, x1, y1, y2, corridor_width)    # 수직 먼저
+            carve_horizontal(dungeon, points, y2, x1, x2, corridor_width)  # 수평 나중
+        else:
+            carve_horizontal(dungeon, points, y1, x1, x2, corridor_width)  # 수평 먼저
+            carve_vertical(dungeon, points, x2, y1, y2, corridor_width)    # 수직 나중
+
+    else: # Z자 복도 (중간 지점 추가)
+        mid_x = min(x1, x2) + int(mid_x_roll * (abs(x1 - x2) + 1))
+        mid_y = min(y1, y2) + int(mid_y_roll * (abs(y1 - y2) + 1))
+
+        carve_vertical(dungeon, points, x1, y1, mid_y, corridor_width)      # y1 -> mid_y (수직)
+        carve_horizontal(dungeon, points, mid_y, x1, mid_x, corridor_width) # x1 -> mid_x (수평, mid_y 에서)
+        carve_vertical(dungeon, points, mid_x, mid_y, y2, corridor_width)   # mid_y -> y2 (수직, mid_x 에서)
+        carve_horizontal(dungeon, points, y2, mid_x, x2, corridor_width)    # mid_x -> x2 (수평, y2 에서)
+
+    return points
+
+def prim_mst_edges(dmat):
+    """
+    거리 행렬 dmat의 최소 신장 트리 엣지 (트리 안 방, 새 방) 리스트를 추가된 순서대로 반환
+    방 그래프는 완전 그래프이므로 엣지 목록 대신 힙으로 경계 엣지만 관리 (프림)
+    """
+    n = len(dmat)
+    dist_rows = dmat.tolist() # 힙에 넣을 때 파이썬 정수로 바로 조회
+    in_tree = [False] * n
+    in_tree[0] = True # 0번 방부터 시작
+    edges = []
+    heap = [(dist_rows[0][j], 0, j) for j in range(1, n)] # (거리, 트리 안 방, 트리 밖 방)
+    heapq.heapify(heap)
+
+    while heap and len(edges) < n - 1:
+        dist, i, j = heapq.heappop(heap)
+        if in_tree[j]:
+            continue
+        
+        # 트리와 새 방을 연결하는 가장 짧은 엣지 선택
+        in_tree[j] = True
+        edges.append((i, j))
+        
+        for k in range(n):
+            if not in_tree[k]:
+                heapq.heappush(heap, (dist_rows[j][k], j, k))
+
+    return edges
+
 # 던전과 높이 맵 생성 함수
 def generate_dungeon(width, height, room_count=8, room_min=8, room_max=15, min_room_distance=4, corridor_width_options=[1, 2]):
     dungeon = np.zeros((height, width), dtype=int)
     rooms = []
-    attempts = 0
+    # 방 사각형을 (N, 4) 배열로도 보관 (열: x, y, w, h) - 겹침 검사를 한 번의 배열 연산으로 처리
+    rooms_arr = np.empty((room_count, 4), dtype=np.int32)
     max_attempts = 200 # 방 생성 시도 횟수 증가
 
+    # 모든 시도의 후보 방 크기와 위치를 한 번에 뽑기 (위치 범위는 크기에 따라 다르므로 균등 난수를 배율 조정)
+    cand_ws = np.random.randint(room_min, room_max, size=max_attempts)
+    cand_hs = np.random.randint(room_min, room_max, size=max_attempts)
+    cand_xs = 1 + (np.random.rand(max_attempts) * (width - cand_ws - 2)).astype(int)   # 1 ~ width-w-2
+    cand_ys = 1 + (np.random.rand(max_attempts) * (height - cand_hs - 2)).astype(int)  # 1 ~ height-h-2
+    candidates = zip(cand_xs.tolist(), cand_ys.tolist(), cand_ws.tolist(), cand_hs.tolist())
+
     # 방 생성 (방 사이 간격 확보)
-    while len(rooms) < room_count and attempts < max_attempts:
-        w = np.random.randint(room_min, room_max)
-        h = np.random.randint(room_min, room_max)
-        x = np.random.randint(1, width - w - 1)
-        y = np.random.randint(1, height - h - 1)
+    for x, y, w, h in candidates:
+        if len(rooms) >= room_count:
+            break
 
         new_room_rect = (x, y, w, h)
         
-        # 새 방이 기존 방과 충분한 거리를 유지하는지 확인
-        too_close = False
-        for rx, ry, rw, rh in rooms:
-            # 두 방 사이 최소 거리 확인 (확장된 영역 고려)
-            if not (x + w + min_room_distance <= rx or rx + rw + min_room_distance <= x or
-                   y + h + min_room_distance <= ry or ry + rh + min_room_distance <= y):
-                too_close = True
-                break
+        # 새 방이 기존 모든 방과 충분한 거리를 유지하는지 한 번에 확인 (확장된 영역 고려)
+        rx, ry, rw, rh = rooms_arr[:len(rooms)].T
+        d = min_room_distance
+        no_overlap = (x + w + d <= rx) | (rx + rw + d <= x) | (y + h + d <= ry) | (ry + rh + d <= y)
+        too_close = not no_overlap.all()
         
-        attempts += 1
         if too_close:
             continue
             
         # 방 추가
         dungeon[y:y+h, x:x+w] = 1
+        rooms_arr[len(rooms)] = new_room_rect
         rooms.append(new_room_rect)
 
     if len(rooms) < 2:
         print("방을 충분히 생성하지 못했습니다.")
         return dungeon, rooms # 방이 2개 미만이면 복도 생성 불가
 
-    # 방 연결 (모든 방 쌍을 고려하여 연결 시도) - MST(Minimum Spanning Tree) 유사 방식 사용
-    connected = {0} # 연결된 방 인덱스 집합 (0번 방부터 시작)
-    edges = [] # (거리, 방1 인덱스, 방2 인덱스)
-    room_centers = [(r[0] + r[2]//2, r[1] + r[3]//2) for r in rooms]
+    # 방 연결 - 방 중심 사이 맨해튼 거리의 최소 신장 트리(MST)로 모든 방을 연결
+    n = len(rooms)
+    centers = rooms_arr[:n, :2] + rooms_arr[:n, 2:] // 2 # (n, 2) 방 중심 (x, y)
+    room_centers = [tuple(c) for c in centers.tolist()]
 
-    for i in range(len(rooms)):
-        for j in range(i + 1, len(rooms)):
-            dist = abs(room_centers[i][0] - room_centers[j][0]) + abs(room_centers[i][1] - room_centers[j][1])
-            edges.append((dist, i, j))
-    
-    edges.sort() # 거리가 짧은 순서로 정렬
-    
-    corridors = [] # 생성된 복도 정보 저장 ((y, x) 좌표 리스트)
+    # 모든 방 쌍의 중심 사이 맨해튼 거리를 브로드캐스팅으로 한 번에 계산
+    dmat = np.abs(centers[:, None, :] - centers[None, :, :]).sum(axis=2)
 
-    num_edges = 0
-    for dist, i, j in edges:
-        if i in connected and j not in connected or i not in connected and j in connected:
-            # 아직 연결되지 않은 두 컴포넌트를 연결하는 엣지 추가
-            connected.add(i)
-            connected.add(j)
-            
-            # 복도 생성
-            x1, y1 = room_centers[i]
-            x2, y2 = room_centers[j]
-            
-            corridor_width = np.random.choice(corridor_width_options) # 복도 너비 랜덤 선택
-            
-            points = [] # 현재 복도의 타일 좌표
-            
-            # 복도 생성 (L자 또는 Z자 형태 추가)
-            if np.random.rand() < 0.7: # L자 복도 확률 증가
-                # 수직 후 수평 또는 수평 후 수직 (L자)
-                if np.random.rand() < 0.5:
-                    # 수직 먼저
-                    for cy in range(min(y1, y2), max(y1, y2) + 1):
-                        for offset in range(corridor_width):
-                            px = x1 + offset
-                            if 0 <= px < width and 0 <= cy < height:
-                                dungeon[cy, px] = 1
-                                points.append((cy, px))
-                    # 수평 나중
-                    for cx in range(min(x1, x2), max(x1, x2) + 1):
-                         for offset in range(corridor_width):
-                            py = y2 + offset
-                            if 0 <= py < height and 0 <= cx < width:
-                                dungeon[py, cx] = 1
-                                points.append((py, cx))
-                else:
-                    # 수평 먼저
-                    for cx in range(min(x1, x2), max(x1, x2) + 1):
-                        for offset in range(corridor_width):
-                            py = y1 + offset
-                            if 0 <= py < height and 0 <= cx < width:
-                                dungeon[py, cx] = 1
-                                points.append((py, cx))
-                    # 수직 나중
-                    for cy in range(min(y1, y2), max(y1, y2) + 1):
-                         for offset in range(corridor_width):
-                            px = x2 + offset
-                            if 0 <= px < width and 0 <= cy < height:
-                                dungeon[cy, px] = 1
-                                points.append((cy, px))
-
-            else: # Z자 복도 (중간 지점 추가)
-                mid_x = np.random.randint(min(x1, x2), max(x1, x2) + 1) if x1 != x2 else x1
-                mid_y = np.random.randint(min(y1, y2), max(y1, y2) + 1) if y1 != y2 else y1
-
-                # y1 -> mid_y (수직)
-                for cy in range(min(y1, mid_y), max(y1, mid_y) + 1):
-                    for offset in range(corridor_width):
-                        px = x1 + offset
-                        if 0 <= px < width and 0 <= cy < height:
-                            dungeon[cy, px] = 1
-                            points.append((cy, px))
-                # x1 -> mid_x (수평, mid_y 에서)
-                for cx in range(min(x1, mid_x), max(x1, mid_x) + 1):
-                    for offset in range(corridor_width):
-                        py = mid_y + offset
-                        if 0 <= py < height and 0 <= cx < width:
-                            dungeon[py, cx] = 1
-                            points.append((py, cx))
-                # mid_y -> y2 (수직, mid_x 에서)
-                for cy in range(min(mid_y, y2), max(mid_y, y2) + 1):
-                    for offset in range(corridor_width):
-                        px = mid_x + offset
-                        if 0 <= px < width and 0 <= cy < height:
-                            dungeon[cy, px] = 1
-                            points.append((cy, px))
-                # mid_x -> x2 (수평, y2 에서)
-                for cx in range(min(mid_x, x2), max(mid_x, x2) + 1):
-                     for offset in range(corridor_width):
-                        py = y2 + offset
-                        if 0 <= py < height and 0 <= cx < width:
-                            dungeon[py, cx] = 1
-                            points.append((py, cx))
-
-            if points:
-                corridors.append(points)
-            num_edges += 1
-            
-            # 모든 방이 연결되면 종료 (최소 연결)
-            if len(connected) == len(rooms):
-                 # 추가 연결 (곁가지 생성 확률)
-                 if np.random.rand() < 0.3 and len(edges) > num_edges: # 30% 확률로 곁가지 추가
-                      dist, i, j = edges[num_edges] # 다음으로 짧은 엣지 사용
-                      if i not in connected or j not in connected: # 아직 완전히 연결되지 않았다면 건너뜀
-                          continue
-                      
-                      # 이미 연결된 컴포넌트 사이에 추가 복도 생성 (곁가지)
-                      x1, y1 = room_centers[i]
-                      x2, y2 = room_centers[j]
-                      corridor_width = np.random.choice(corridor_width_options)
-                      points = []
-                      
-                      # 간단한 L자 복도로 곁가지 생성
-                      if np.random.rand() < 0.5:
-                          for cy in range(min(y1, y2), max(y1, y2) + 1):
-                              for offset in range(corridor_width):
-                                  px = x1 + offset
-                                  if 0 <= px < width and 0 <= cy < height: dungeon[cy, px] = 1; points.append((cy, px))
-                          for cx in range(min(x1, x2), max(x1, x2) + 1):
-                              for offset in range(corridor_width):
-                                  py = y2 + offset
-                                  if 0 <= py < height and 0 <= cx < width: dungeon[py, cx] = 1; points.append((py, cx))
-                      else:
-                          for cx in range(min(x1, x2), max(x1, x2) + 1):
-                              for offset in range(corridor_width):
-                                  py = y1 + offset
-                                  if 0 <= py < height and 0 <= cx < width: dungeon[py, cx] = 1; points.append((py, cx))
-                          for cy in range(min(y1, y2), max(y1, y2) + 1):
-                              for offset in range(corridor_width):
-                                  px = x2 + offset
-                                  if 0 <= px < width and 0 <= cy < height: dungeon[cy, px] = 1; points.append((cy, px))
-                                  
-                      if points: corridors.append(points)
-                      print(f"곁가지 복도 추가: 방 {i} <-> 방 {j}")
-                      
-                 # break # 최소 연결만 하려면 주석 해제
+    # 방끼리는 겹치지 않아 중심 거리가 항상 양수이므로 상삼각 행렬만 넘겨도 빠지는 엣지가 없음
+    if minimum_spanning_tree is not None:
+        mst = minimum_spanning_tree(csr_matrix(np.triu(dmat, 1))).tocoo()
+        mst_edges = list(zip(mst.row.tolist(), mst.col.tolist()))
+    else:
+        mst_edges = prim_mst_edges(dmat)
+    tree_edges = {(min(i, j), max(i, j)) for i, j in mst_edges} # MST에 사용된 (방1, 방2) 쌍
+
+    # 복도마다 필요한 난수 (너비, 모양 결정용 4개)를 MST n-1개 + 곁가지 1개 분량만큼 한 번에 뽑아 두고 순서대로 소비
+    corridor_widths = np.random.choice(corridor_width_options, size=n).tolist()
+    corridor_rolls = np.random.rand(n, 4).tolist()
+    branch_roll = np.random.rand()
+    pool_idx = 0
+
+    corridors = [] # 생성된 복도 정보 저장 ((y, x) 좌표 리스트)
+    for i, j in mst_edges:
+        points = carve_corridor(dungeon, room_centers[i], room_centers[j],
+                                corridor_widths[pool_idx], corridor_rolls[pool_idx])
+        pool_idx += 1
+        if points:
+            corridors.append(points)
+
+    # MST에 쓰이지 않은 엣지 (곁가지 후보) - 상삼각 쌍 중 트리 엣지를 뺀 것
+    ii, jj = np.triu_indices(n, k=1)
+    in_mst = np.zeros((n, n), dtype=bool)
+    if tree_edges:
+        in_mst[tuple(np.array(list(tree_edges)).T)] = True
+    unused = ~in_mst[ii, jj]
+
+    # 모든 방이 연결된 뒤 추가 연결 (곁가지 생성 확률)
+    if unused.any() and branch_roll < 0.3: # 30% 확률로 곁가지 추가
+        # MST에 쓰이지 않은 가장 짧은 엣지 사용 (같은 거리면 방 번호가 작은 쌍)
+        k = np.flatnonzero(unused)[dmat[ii[unused], jj[unused]].argmin()]
+        i, j = int(ii[k]), int(jj[k])
+        # 이미 연결된 컴포넌트 사이에 추가 복도 생성 (간단한 L자 곁가지)
+        points = carve_corridor(dungeon, room_centers[i], room_centers[j],
+                                corridor_widths[pool_idx], corridor_rolls[pool_idx], allow_z=False)
+        if points: corridors.append(points)
+        print(f"곁가지 복도 추가: 방 {i} <-> 방 {j}")
 
     return dungeon, rooms, corridors
 
@@ -193,56 +216,59 @@ def generate_height_map(dungeon, rooms, corridors, smoothness=3, max_height=15,
     height, width = dungeon.shape
     noise = np.random.rand(height, width)
     
-    # 노이즈 부드럽게 만들기 (횟수 감소)
+    # 노이즈 부드럽게 만들기 (횟수 감소) - 경계는 순환(wrap)
     for _ in range(smoothness):
-        noise = (noise +
-                 np.roll(noise, 1, axis=0) + np.roll(noise, -1, axis=0) +
-                 np.roll(noise, 1, axis=1) + np.roll(noise, -1, axis=1)) / 5
+        if convolve is not None:
+            noise = convolve(noise, SMOOTH_KERNEL, mode='wrap')
+        else:
+            noise = (noise +
+                     np.roll(noise, 1, axis=0) + np.roll(noise, -1, axis=0) +
+                     np.roll(noise, 1, axis=1) + np.roll(noise, -1, axis=1)) / 5
     
     height_map = (noise * max_height).astype(int) * (dungeon == 1)
     
     # 각 방마다 다른 기본 높이 할당 (1~15)
     room_heights = np.random.randint(1, max_height + 1, size=len(rooms))
     
+    # 방 내부(가장자리 제외) 마스크를 한 번만 만들어 방 가장자리 판정과 복도 제외에 함께 사용
+    # (방끼리는 겹치지 않으므로 방 영역 안에서 내부가 아닌 칸이 곧 그 방의 가장자리)
+    room_interior_mask = np.zeros((height, width), dtype=bool)
+    for rx, ry, rw, rh in rooms:
+        room_interior_mask[ry+1:ry+rh-1, rx+1:rx+rw-1] = True
+    
     # 방 내부 높이 설정 (가장자리는 약간 변화, 내부는 거의 일정)
     for i, (x, y, w, h) in enumerate(rooms):
         base_height = room_heights[i]
-        for ry in range(y, y + h):
-            for rx in range(x, x + w):
-                if dungeon[ry, rx] == 1:
-                    # 가장자리 약간의 변화, 안쪽은 거의 일정
-                    if rx == x or rx == x + w - 1 or ry == y or ry == y + h - 1:
-                        height_map[ry, rx] = max(1, base_height + np.random.randint(-1, 2))
-                    else:
-                         # 방 내부 높이 랜덤성 약간 추가
-                        height_map[ry, rx] = max(1, base_height + np.random.randint(-1, 1)) # -1, 0 중 선택
-
-    # 복도 높이 설정 (낮은 범위 내에서 랜덤)
-    all_corridor_points = set(itertools.chain(*corridors)) if corridors else set()
-    for r in range(height):
-        for c in range(width):
-            if dungeon[r, c] == 1 and (r, c) in all_corridor_points:
-                 # 복도인지 확인 (방 내부는 제외)
-                 is_in_room_interior = False
-                 for rx, ry, rw, rh in rooms:
-                     if rx < c < rx + rw -1 and ry < r < ry + rh -1:
-                         is_in_room_interior = True
-                         break
-                 if not is_in_room_interior:
-                    height_map[r, c] = np.random.randint(corridor_height_range[0], corridor_height_range[1] + 1)
-
-                    # 복도 중간에 장애물(엄폐물) 추가
-                    if np.random.rand() < obstacle_prob:
-                         # 주변 타일이 복도인지 확인
-                         is_surrounded_by_corridor = True
-                         for dr, dc in [(-1,0), (1,0), (0,-1), (0,1)]:
-                             nr, nc = r + dr, c + dc
-                             if not (0 <= nr < height and 0 <= nc < width and (nr, nc) in all_corridor_points):
-                                 is_surrounded_by_corridor = False
-                                 break
-                         if is_surrounded_by_corridor: # 주변도 복도일 때만 장애물 생성
-                            height_map[r, c] = height_map[r,c] + np.random.randint(obstacle_height_range[0], obstacle_height_range[1] + 1)
-                            print(f"복도 장애물 추가: ({r}, {c}), 높이: {height_map[r, c]}")
+        region = height_map[y:y+h, x:x+w]
+        mask = dungeon[y:y+h, x:x+w] == 1
+        
+        # 가장자리 약간의 변화(-1~1), 안쪽은 거의 일정 (방 내부 높이 랜덤성 약간 추가: -1, 0 중 선택)
+        edge_mask = ~room_interior_mask[y:y+h, x:x+w]
+        deltas = np.where(edge_mask, np.random.randint(-1, 2, size=(h, w)), np.random.randint(-1, 1, size=(h, w)))
+        region[mask] = np.maximum(1, base_height + deltas)[mask]
+
+    # 복도 높이 설정 (낮은 범위 내에서 랜덤) - 칸마다 검사하지 않고 불리언 마스크로 한 번에 처리
+    # 복도 좌표를 튜플 집합으로 해싱하지 않고 y*width+x 정수 키 배열로 모아 불리언 격자에 한 번에 표시
+    # (중복 좌표는 같은 칸을 다시 True로 쓸 뿐이므로 중복 제거가 필요 없음)
+    corridor_keys = np.fromiter((cy * width + cx for pts in corridors for cy, cx in pts), dtype=np.int64)
+    corridor_mask = np.zeros(height * width, dtype=bool)
+    corridor_mask[corridor_keys] = True
+    corridor_mask = corridor_mask.reshape(height, width)
+    
+    corridor_tiles = (dungeon == 1) & corridor_mask & ~room_interior_mask
+    n_tiles = np.count_nonzero(corridor_tiles)
+    corridor_heights = np.random.randint(corridor_height_range[0], corridor_height_range[1] + 1, size=n_tiles)
+    
+    # 복도 중간에 장애물(엄폐물) 추가 - 상하좌우가 모두 복도인 타일만 대상
+    padded = np.pad(corridor_mask, 1, constant_values=False)
+    surrounded = padded[:-2, 1:-1] & padded[2:, 1:-1] & padded[1:-1, :-2] & padded[1:-1, 2:]
+    is_obstacle = (np.random.rand(n_tiles) < obstacle_prob) & surrounded[corridor_tiles]
+    corridor_heights[is_obstacle] += np.random.randint(obstacle_height_range[0], obstacle_height_range[1] + 1,
+                                                       size=np.count_nonzero(is_obstacle))
+    height_map[corridor_tiles] = corridor_heights
+    
+    for r, c in np.argwhere(corridor_tiles)[is_obstacle].tolist():
+        print(f"복도 장애물 추가: ({r}, {c}), 높이: {height_map[r, c]}")
 
     # 높이가 0인 타일 제거 (최소 높이 1)
     height_map = np.maximum(height_map, 1) * (dungeon == 1)
@@ -300,6 +326,66 @@ def select_entrance_exit(dungeon, rooms, height_map):
 
     return entrance, exit_coords
 
+def _bfs_flat(walkable, heights, width, start, goal, max_height_diff):
+    """
+    1차원으로 펼친 격자(인덱스 = y*width + x)에서 BFS 수행
+    고정 크기 배열 큐와 부모 인덱스 배열을 사용하므로 numba로 컴파일 가능
+    반환: (부모 인덱스 배열, 방문 여부 배열, 출구 도달 여부)
+    """
+    n = walkable.shape[0]
+    height = n // width
+    queue = np.empty(n, dtype=np.int32)
+    parents = np.full(n, -1, dtype=np.int32)
+    visited = np.zeros(n, dtype=np.bool_)
+    
+    head = 0
+    tail = 0
+    queue[tail] = start
+    tail += 1
+    visited[start] = True
+    
+    while head < tail:
+        c = queue[head]
+        head += 1
+        
+        # 출구에 도달한 경우
+        if c == goal:
+            return parents, visited, True
+        
+        y = c // width
+        x = c - y * width
+        
+        # 인접한 타일로 이동 (상, 하, 좌, 우)
+        for k in range(4):
+            if k == 0:
+                if y == 0:
+                    continue
+                nc = c - width
+            elif k == 1:
+                if y == height - 1:
+                    continue
+                nc = c + width
+            elif k == 2:
+                if x == 0:
+                    continue
+                nc = c - 1
+            else:
+                if x == width - 1:
+                    continue
+                nc = c + 1
+            
+            # 던전 타일이며 아직 방문하지 않았고 높이 차이가 허용 범위인 경우
+            if walkable[nc] and not visited[nc] and abs(heights[nc] - heights[c]) <= max_height_diff:
+                visited[nc] = True
+                parents[nc] = c
+                queue[tail] = nc
+                tail += 1
+    
+    return parents, visited, False
+
+if njit is not None:
+    _bfs_flat = njit(cache=True)(_bfs_flat)
+
 def find_path_bfs(dungeon, height_map, entrance, exit_coords, max_height_diff=4): # 최대 높이 차이 증가
     """
     BFS를 사용해 입구에서 출구까지의 경로 찾기
@@ -309,25 +395,20 @@ def find_path_bfs(dungeon, height_map, entrance, exit_coords, max_height_diff=4)
 
     height, width = dungeon.shape
     visited = np.zeros_like(dungeon, dtype=bool)
-    queue = deque([(entrance[0], entrance[1], [])])  # (y, x, path)
     
     # 입구가 던전 타일이 아니거나 높이맵 정보가 없는 경우 처리
     if not (0 <= entrance[0] < height and 0 <= entrance[1] < width and dungeon[entrance[0], entrance[1]] == 1):
         print(f"오류: 입구 {entrance}가 유효한 던전 타일이 아닙니다.")
         # 가장 가까운 유효한 던전 타일을 찾아 입구로 재설정 (간단한 방식)
-        min_dist = float('inf')
+        # 모든 던전 타일까지의 맨해튼 거리를 한 번에 계산 (같은 거리면 행 우선 순서로 먼저 나오는 타일)
+        coords = np.argwhere(dungeon == 1)
         new_entrance = None
-        for r in range(height):
-            for c in range(width):
-                if dungeon[r,c] == 1:
-                    dist = abs(r - entrance[0]) + abs(c - entrance[1])
-                    if dist < min_dist:
-                        min_dist = dist
-                        new_entrance = (r, c)
+        if len(coords):
+            dists = np.abs(coords[:, 0] - entrance[0]) + np.abs(coords[:, 1] - entrance[1])
+            new_entrance = tuple(coords[dists.argmin()].tolist())
         if new_entrance:
              print(f"입구를 가장 가까운 유효 타일 {new_entrance}로 변경합니다.")
              entrance = new_entrance
-             queue = deque([(entrance[0], entrance[1], [])])
         else:
              print("유효한 입구를 찾을 수 없습니다.")
              return None, None
@@ -337,36 +418,66 @@ def find_path_bfs(dungeon, height_map, entrance, exit_coords, max_height_diff=4)
     # 이동 방향 (상, 하, 좌, 우)
     directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
     
-    while queue:
-        y, x, path = queue.popleft()
-        current_path = path + [(y, x)]
+    if njit is not None:
+        # numba 컴파일된 BFS 사용 (높이 0은 1로 간주) 후 부모 인덱스를 따라 경로 복원
+        start = entrance[0] * width + entrance[1]
+        goal = exit_coords[0] * width + exit_coords[1]
+        parents, visited_flat, found = _bfs_flat(
+            np.ascontiguousarray(dungeon == 1).ravel(),
+            np.maximum(height_map, 1).astype(np.int64).ravel(),
+            width, start, goal, max_height_diff)
         
-        # 출구에 도달한 경우
-        if (y, x) == exit_coords:
-            return current_path, None  # 경로 반환, 문제 지점 없음
+        if found:
+            path = []
+            c = goal
+            while c != -1:
+                path.append(divmod(int(c), width))
+                c = parents[c]
+            path.reverse()
+            return path, None  # 경로 반환, 문제 지점 없음
         
-        # 인접한 타일로 이동
-        for dy, dx in directions:
-            ny, nx = y + dy, x + dx
+        visited = visited_flat.reshape(height, width)
+    else:
+        # 큐에는 좌표만 넣고, 경로는 부모 좌표 테이블로 마지막에 한 번만 복원
+        parent = np.full((height, width, 2), -1, dtype=np.int16)
+        queue = deque([tuple(entrance)])
+        
+        while queue:
+            y, x = queue.popleft()
+        
+            # 출구에 도달한 경우
+            if (y, x) == exit_coords:
+                path = []
+                cur = (y, x)
+                while cur != (-1, -1):
+                    path.append(cur)
+                    cur = tuple(int(v) for v in parent[cur])
+                path.reverse()
+                return path, None  # 경로 반환, 문제 지점 없음
+        
+            # 인접한 타일로 이동
+            for dy, dx in directions:
+                ny, nx = y + dy, x + dx
             
-            # 맵 범위 내이고 던전 타일이며 아직 방문하지 않은 경우
-            if (0 <= ny < height and 0 <= nx < width and 
-                dungeon[ny, nx] == 1 and not visited[ny, nx]):
+                # 맵 범위 내이고 던전 타일이며 아직 방문하지 않은 경우
+                if (0 <= ny < height and 0 <= nx < width and 
+                    dungeon[ny, nx] == 1 and not visited[ny, nx]):
                 
-                # 높이 차이 계산 (현재 타일과 다음 타일 모두 높이 정보가 있는지 확인)
-                current_h = height_map[y, x]
-                next_h = height_map[ny, nx]
+                    # 높이 차이 계산 (현재 타일과 다음 타일 모두 높이 정보가 있는지 확인)
+                    current_h = height_map[y, x]
+                    next_h = height_map[ny, nx]
                 
-                # 가끔 높이맵에 0이 들어가는 경우 방지 (최소 높이 1 가정)
-                if current_h == 0: current_h = 1
-                if next_h == 0: next_h = 1
+                    # 가끔 높이맵에 0이 들어가는 경우 방지 (최소 높이 1 가정)
+                    if current_h == 0: current_h = 1
+                    if next_h == 0: next_h = 1
                 
-                height_diff = abs(next_h - current_h)
+                    height_diff = abs(next_h - current_h)
                 
-                # 높이 차이가 허용 범위 내면 이동
-                if height_diff <= max_height_diff:
-                    visited[ny, nx] = True
-                    queue.append((ny, nx, current_path))
+                    # 높이 차이가 허용 범위 내면 이동
+                    if height_diff <= max_height_diff:
+                        visited[ny, nx] = True
+                        parent[ny, nx] = (y, x)
+                        queue.append((ny, nx))
     
     # 경로를 찾지 못한 경우, 높이 차이가 큰 문제 지점 찾기
     problematic_points = []
@@ -424,7 +535,7 @@ def adjust_heights_for_path(dungeon, height_map, problematic_points, max_height_
     return height_map
 
 def ensure_path_exists(dungeon, height_map, entrance, exit_coords, max_attempts=10, max_height_diff=4): # 시도 횟수 증가
-    """입구에서 출구까지 경로가 존재하도록 높이 조정"""
+    """입구에서 출구까지 경로가 존재하도록 높이 조정 (height_map을 제자리에서 수정하고 그대로 반환)"""
     if entrance is None or exit_coords is None:
         print("입구 또는 출구가 설정되지 않아 경로를 보장할 수 없습니다.")
         return height_map, None
@@ -500,8 +611,8 @@ for dungeon_attempt in range(max_dungeon_attempts):
 
     print(f"입구: {entrance}, 출구: {exit_coords}")
 
-    # 경로 확인 및 높이 조정
-    adjusted_height_map, path = ensure_path_exists(dungeon, height_map.copy(), entrance, exit_coords, max_height_diff=max_height_diff)
+    # 경로 확인 및 높이 조정 - 높이 맵은 시도마다 새로 만들므로 복사 없이 제자리에서 조정
+    adjusted_height_map, path = ensure_path_exists(dungeon, height_map, entrance, exit_coords, max_height_diff=max_height_diff)
 
     if path:
         print("성공적인 던전 생성 완료!")
@@ -537,79 +648,88 @@ colors = ['#2c3e50', '#3498db', '#1abc9c', '#f1c40f', '#e67e22', '#e74c3c'] # 
 cmap = LinearSegmentedColormap.from_list('custom_terrain', colors, N=256)
 
 # 타일 정보 수집
-tiles_to_draw = []
-for y in range(height):
-    for x in range(width):
-        if final_dungeon[y, x] == 1:
-            h = final_height_map[y, x]
-            iso_x = (x - y) * tile_width / 2
-            iso_y = (x + y) * tile_height / 2
-            tiles_to_draw.append({'x': x, 'y': y, 'h': h, 'iso_x': iso_x, 'iso_y': iso_y})
-
-# 그리기 순서 정렬 (y좌표 -> x좌표 -> 높이 역순) - 더 정확한 가림 처리
-tiles_to_draw.sort(key=lambda t: (t['y'], t['x'], -t['h']))
-
-# 경로 좌표 집합
-path_set = set(final_path) if final_path else set()
-
-# 타일 그리기
+# 던전 타일 좌표, 높이, 아이소메트릭 좌표를 배열 연산으로 한 번에 계산해 레코드 배열로 보관
+tile_ys, tile_xs = np.nonzero(final_dungeon == 1)
+tile_hs = final_height_map[tile_ys, tile_xs]
+tiles_to_draw = np.empty(len(tile_ys), dtype=[('x', np.int64), ('y', np.int64), ('h', np.int64),
+                                              ('iso_x', np.float64), ('iso_y', np.float64)])
+tiles_to_draw['x'] = tile_xs
+tiles_to_draw['y'] = tile_ys
+tiles_to_draw['h'] = tile_hs
+tiles_to_draw['iso_x'] = (tile_xs - tile_ys) * tile_width / 2
+tiles_to_draw['iso_y'] = (tile_xs + tile_ys) * tile_height / 2
+
+# 그리기 순서 정렬 (y좌표 -> x좌표 -> 높이 역순) - 더 정확한 가림 처리 (lexsort는 마지막 키가 1순위)
+tiles_to_draw = tiles_to_draw[np.lexsort((-tiles_to_draw['h'], tiles_to_draw['x'], tiles_to_draw['y']))]
+
+# 타일 그리기 - 모든 면을 그리는 순서대로 모아 PolyCollection 하나로 추가
+# (타일마다 왼쪽 면, 오른쪽 면, (출구 강조 테두리,) 윗면 순서를 유지하므로 겹침 결과는 개별 Polygon과 같음)
 max_h_val = max(1, final_height_map.max()) # 0으로 나누기 방지
 
-for tile in tiles_to_draw:
-    x, y, h, iso_x, iso_y = tile['x'], tile['y'], tile['h'], tile['iso_x'], tile['iso_y']
-    
-    normalized_height = h / max_h_val
-    base_color = cmap(normalized_height)
-    
-    # 타일 윗면 좌표
-    top_y_offset = iso_y - h * height_scale
-    top_coord = (iso_x, top_y_offset)
-    right_coord = (iso_x + tile_width/2, top_y_offset + tile_height/2)
-    bottom_coord = (iso_x, top_y_offset + tile_height)
-    left_coord = (iso_x - tile_width/2, top_y_offset + tile_height/2)
-    
-    # 타일 옆면 그리기 (높이가 0보다 클 때만)
-    if h > 0:
-        # 왼쪽 면 (더 어둡게)
-        left_side_coords = [left_coord, (left_coord[0], iso_y + tile_height/2), (iso_x, iso_y + tile_height), bottom_coord]
-        left_poly = Polygon(left_side_coords, closed=True, facecolor=tuple(c*0.5 for c in base_color[:3]) + (base_color[3],), edgecolor='black', linewidth=0.3)
-        ax.add_patch(left_poly)
-        
-        # 오른쪽 면 (약간 어둡게)
-        right_side_coords = [bottom_coord, (iso_x, iso_y + tile_height), (right_coord[0], iso_y + tile_height/2), right_coord]
-        right_poly = Polygon(right_side_coords, closed=True, facecolor=tuple(c*0.7 for c in base_color[:3]) + (base_color[3],), edgecolor='black', linewidth=0.3)
-        ax.add_patch(right_poly)
-
-    # 타일 윗면 그리기
-    top_poly_coords = [top_coord, right_coord, bottom_coord, left_coord]
-    
-    # 타일 색상 및 테두리 결정
-    tile_face_color = base_color
-    tile_edge_color = 'black'
-    tile_linewidth = 0.5
-    
-    is_entrance = (y, x) == final_entrance
-    is_exit = (y, x) == final_exit
-    is_path = (y, x) in path_set
-    
-    if is_entrance:
-        tile_face_color = 'lime' # 밝은 녹색
-        tile_edge_color = 'black'
-        tile_linewidth = 1.5
-    elif is_exit:
-        tile_face_color = 'red'
-        tile_edge_color = 'black'
-        tile_linewidth = 1.5
-        # 출구 주변 강조 (노란색 테두리)
-        border_poly = Polygon(top_poly_coords, closed=True, facecolor='none', edgecolor='yellow', linewidth=2.5)
-        ax.add_patch(border_poly)
-    elif is_path:
-        tile_face_color = 'yellow'
-        tile_edge_color = 'black'
-        tile_linewidth = 0.8
-    
-    top_poly = Polygon(top_poly_coords, closed=True, facecolor=tile_face_color, edgecolor=tile_edge_color, linewidth=tile_linewidth)
-    ax.add_patch(top_poly)
+# 면 색상 팔레트: [윗면 높이 색상 N개 | 왼쪽 면 N개 (더 어둡게) | 오른쪽 면 N개 (약간 어둡게) | 강조 색상]
+# 높이 색상은 컬러맵에 한 번에 넣어 계산하고, 측면은 RGB에 배율을 곱해 어둡게 (알파는 유지)
+n_tiles = len(tiles_to_draw)
+base_colors = cmap(tiles_to_draw['h'] / max_h_val)
+special_colors = to_rgba_array(['lime', 'red', 'yellow', 'none'])
+LIME, RED, YELLOW, NONE = range(3 * n_tiles, 3 * n_tiles + 4)
+color_palette = np.concatenate([
+    base_colors,
+    base_colors * (0.5, 0.5, 0.5, 1.0),
+    base_colors * (0.7, 0.7, 0.7, 1.0),
+    special_colors,
+])
+
+# 타일 종류별 마스크 (입구 > 출구 > 경로 우선순위)
+tile_xs, tile_ys, tile_hs = tiles_to_draw['x'], tiles_to_draw['y'], tiles_to_draw['h']
+path_grid = np.zeros(final_dungeon.shape, dtype=bool)
+if final_path:
+    path_grid[tuple(np.array(final_path).T)] = True
+is_entrance = (tile_ys == final_entrance[0]) & (tile_xs == final_entrance[1]) if final_entrance else np.zeros(n_tiles, dtype=bool)
+is_exit = (tile_ys == final_exit[0]) & (tile_xs == final_exit[1]) & ~is_entrance if final_exit else np.zeros(n_tiles, dtype=bool)
+is_path = path_grid[tile_ys, tile_xs] & ~is_entrance & ~is_exit
+
+# 정렬된 순서 그대로 모든 타일의 꼭짓점을 배열 연산으로 계산
+iso_x = tiles_to_draw['iso_x']
+iso_y = tiles_to_draw['iso_y']
+top_y_offset = iso_y - tile_hs * height_scale
+top_coord = np.stack([iso_x, top_y_offset], axis=-1)
+right_coord = np.stack([iso_x + tile_width/2, top_y_offset + tile_height/2], axis=-1)
+bottom_coord = np.stack([iso_x, top_y_offset + tile_height], axis=-1)
+left_coord = np.stack([iso_x - tile_width/2, top_y_offset + tile_height/2], axis=-1)
+ground_left = np.stack([left_coord[:, 0], iso_y + tile_height/2], axis=-1)
+ground_bottom = np.stack([iso_x, iso_y + tile_height], axis=-1)
+ground_right = np.stack([right_coord[:, 0], iso_y + tile_height/2], axis=-1)
+top_poly_coords = np.stack([top_coord, right_coord, bottom_coord, left_coord], axis=1)
+
+# 타일마다 면 슬롯 4개: [왼쪽 면 (더 어둡게), 오른쪽 면 (약간 어둡게), 출구 강조 테두리, 윗면]
+# 쓰지 않는 슬롯을 마스크로 빼고 행 우선으로 펼치면 타일별 그리기 순서가 그대로 유지됨
+face_verts = np.stack([
+    np.stack([left_coord, ground_left, ground_bottom, bottom_coord], axis=1),
+    np.stack([bottom_coord, ground_bottom, ground_right, right_coord], axis=1),
+    top_poly_coords,
+    top_poly_coords,
+], axis=1) # (타일 수, 4, 꼭짓점 4, 2)
+has_sides = tile_hs > 0 # 옆면은 높이가 0보다 클 때만
+face_used = np.stack([has_sides, has_sides, is_exit, np.ones(n_tiles, dtype=bool)], axis=1)
+
+tile_idx = np.arange(n_tiles)
+top_color = np.select([is_entrance, is_exit, is_path], [LIME, RED, YELLOW], default=tile_idx)
+face_color_idx = np.stack([n_tiles + tile_idx, 2 * n_tiles + tile_idx,
+                           np.full(n_tiles, NONE), top_color], axis=1)
+
+black, yellow = to_rgba_array(['black', 'yellow'])
+face_edgecolors = np.broadcast_to(black, (n_tiles, 4, 4)).copy()
+face_edgecolors[:, 2] = yellow # 출구 주변 강조 (노란색 테두리)
+
+top_linewidth = np.select([is_entrance | is_exit, is_path], [1.5, 0.8], default=0.5)
+face_linewidths = np.stack([np.full(n_tiles, 0.3), np.full(n_tiles, 0.3),
+                            np.full(n_tiles, 2.5), top_linewidth], axis=1)
+
+poly_verts = face_verts[face_used]
+poly_facecolors = color_palette[face_color_idx[face_used]] # (면 개수, 4) RGBA 배열
+
+ax.add_collection(PolyCollection(poly_verts, closed=True, facecolors=poly_facecolors,
+                                 edgecolors=face_edgecolors[face_used], linewidths=face_linewidths[face_used]))
 
 # 축 범위 자동 설정 및 여백 조정
 ax.autoscale_view()
@@ -1,11 +1,28 @@
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.patches import Polygon
-from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.collections import PolyCollection
+from matplotlib.colors import LinearSegmentedColormap, to_rgba
 import matplotlib as mpl
 import heapq
-from collections import deque
-import itertools
+from collections import deque, defaultdict
+
+# numba가 설치되어 있으면 복도 높이/특성 설정 루프와 BFS를 네이티브 코드로 컴파일해서 사용
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# scipy가 있으면 노이즈 평활화를 컴파일된 합성곱으로 처리
+try:
+    from scipy.ndimage import convolve
+except ImportError:
+    convolve = None
+
+# 상하좌우+자기 자신 5점 평균 커널
+SMOOTH_KERNEL = np.array([[0, 1, 0],
+                          [1, 1, 1],
+                          [0, 1, 0]]) / 5
 
 # 폰트 설정 (한글 표시)
 plt.rcParams['font.family'] = 'Malgun Gothic'
@@ -29,28 +46,43 @@ def generate_dungeon(width, height, room_count=8, room_min=8, room_max=15, min_r
     # ... (map5.py와 동일) ...
     dungeon = np.zeros((height, width), dtype=int)
     rooms = []
-    attempts = 0
+    # 방 사각형을 (N, 4) 배열로도 보관 (열: x, y, w, h) - 겹침 검사를 한 번의 배열 연산으로 처리
+    rooms_arr = np.empty((room_count, 4), dtype=np.int32)
     max_attempts = 200
 
+    # 모든 시도의 후보 방 크기와 위치를 한 번에 뽑기 (위치 범위는 크기에 따라 다르므로 균등 난수를 배율 조정)
+    cand_ws = np.random.randint(room_min, room_max, size=max_attempts)
+    cand_hs = np.random.randint(room_min, room_max, size=max_attempts)
+    cand_xs = 1 + (np.random.rand(max_attempts) * (width - cand_ws - 2)).astype(int)   # 1 ~ width-w-2
+    cand_ys = 1 + (np.random.rand(max_attempts) * (height - cand_hs - 2)).astype(int)  # 1 ~ height-h-2
+    candidates = zip(cand_xs.tolist(), cand_ys.tolist(), cand_ws.tolist(), cand_hs.tolist())
+
+    # 공간 해시: 맵을 bucket_size 크기 칸으로 나누고 방 번호를 방이 걸친 모든 칸에 등록
+    # 후보 방은 간격(d)까지 넓힌 영역이 걸친 칸(보통 3x3 이하)에 등록된 방들하고만 비교
+    d = min_room_distance
+    bucket_size = room_max + d
+    buckets = defaultdict(list)
+
     # 방 생성
-    while len(rooms) < room_count and attempts < max_attempts:
-        w = np.random.randint(room_min, room_max)
-        h = np.random.randint(room_min, room_max)
-        x = np.random.randint(1, width - w - 1)
-        y = np.random.randint(1, height - h - 1)
+    for x, y, w, h in candidates:
+        if len(rooms) >= room_count: break
         new_room_rect = (x, y, w, h)
         
-        too_close = False
-        for rx, ry, rw, rh in rooms:
-            if not (x + w + min_room_distance <= rx or rx + rw + min_room_distance <= x or
-                   y + h + min_room_distance <= ry or ry + rh + min_room_distance <= y):
-                too_close = True
-                break
-        
-        attempts += 1
-        if too_close: continue
+        # 넓힌 영역 (x-d ~ x+w+d-1, y-d ~ y+h+d-1)과 같은 칸에 있는 방들과의 간격을 한 번에 확인
+        near = {i
+                for bx in range((x - d) // bucket_size, (x + w + d - 1) // bucket_size + 1)
+                for by in range((y - d) // bucket_size, (y + h + d - 1) // bucket_size + 1)
+                for i in buckets.get((bx, by), ())}
+        if near:
+            rx, ry, rw, rh = rooms_arr[list(near)].T
+            too_close = np.any((x + w + d > rx) & (rx + rw + d > x) & (y + h + d > ry) & (ry + rh + d > y))
+            if too_close: continue
             
         dungeon[y:y+h, x:x+w] = 1
+        for bx in range(x // bucket_size, (x + w - 1) // bucket_size + 1):
+            for by in range(y // bucket_size, (y + h - 1) // bucket_size + 1):
+                buckets[(bx, by)].append(len(rooms))
+        rooms_arr[len(rooms)] = new_room_rect
         rooms.append(new_room_rect)
 
     if len(rooms) < 2:
@@ -58,33 +90,46 @@ def generate_dungeon(width, height, room_count=8, room_min=8, room_max=15, min_r
         return dungeon, rooms, [] # 빈 복도 리스트 반환
 
     # 방 연결 (MST + 추가 연결)
-    connected = {0}
-    edges = []
-    room_centers = [(r[0] + r[2]//2, r[1] + r[3]//2) for r in rooms]
-
-    for i in range(len(rooms)):
-        for j in range(i + 1, len(rooms)):
-            dist = abs(room_centers[i][0] - room_centers[j][0]) + abs(room_centers[i][1] - room_centers[j][1])
-            edges.append((dist, i, j))
-    
-    edges.sort()
+    n = len(rooms)
+    centers = rooms_arr[:n, :2] + rooms_arr[:n, 2:] // 2 # (n, 2) 방 중심 (x, y)
+    room_centers = [tuple(c) for c in centers.tolist()]
+
+    # 모든 방 쌍의 중심 사이 맨해튼 거리를 브로드캐스팅으로 한 번에 계산
+    dist_rows = np.abs(centers[:, None, :] - centers[None, :, :]).sum(axis=2).tolist()
     
-    corridors = [] # 복도 타일 좌표 리스트들의 리스트
+    corridors = [] # 복도별 타일 좌표를 y*width+x 정수 키로 압축한 배열들의 리스트
+    remaining_edges = [] # MST에 사용되지 않은 엣지 (곁가지 후보)
+
+    # MST 연결 (프림) - 전체 엣지 목록을 만들어 정렬하지 않고 힙으로 트리 경계 엣지만 관리
+    # 방 쌍은 먼저 트리에 들어간 쪽이 추가될 때 한 번만 힙에 들어가므로
+    # 힙에서 버려지거나 끝까지 남은 엣지가 곧 MST에 쓰이지 않은 엣지
+    in_tree = [False] * n
+    in_tree[0] = True # 0번 방부터 시작
+    heap = [(dist_rows[0][j], 0, j) for j in range(1, n)] # (거리, 트리 안 방, 트리 밖 방)
+    heapq.heapify(heap)
     mst_edges_count = 0
-
-    # MST 연결
-    for dist, i, j in edges:
-        if len(connected) == len(rooms): break # 이미 모든 방이 연결됨
-        if i in connected and j not in connected or i not in connected and j in connected:
-            connected.add(i); connected.add(j)
-            x1, y1 = room_centers[i]; x2, y2 = room_centers[j]
-            corridor_width = np.random.choice(corridor_width_options)
-            points = create_corridor(dungeon, x1, y1, x2, y2, corridor_width)
-            if points: corridors.append(points)
-            mst_edges_count += 1
+    
+    while heap and mst_edges_count < n - 1:
+        dist, i, j = heapq.heappop(heap)
+        if in_tree[j]:
+            remaining_edges.append((dist, min(i, j), max(i, j)))
+            continue
+        in_tree[j] = True
+        
+        x1, y1 = room_centers[i]; x2, y2 = room_centers[j]
+        corridor_width = np.random.choice(corridor_width_options)
+        points = create_corridor(dungeon, x1, y1, x2, y2, corridor_width)
+        if points.size: corridors.append(points)
+        mst_edges_count += 1
+        
+        for k in range(n):
+            if not in_tree[k]:
+                heapq.heappush(heap, (dist_rows[j][k], j, k))
+    
+    remaining_edges.extend((dist, min(i, j), max(i, j)) for dist, i, j in heap)
+    remaining_edges.sort() # 섞기 전 순서를 (거리, 방1, 방2) 순으로 고정
 
     # 추가 연결 (곁가지)
-    remaining_edges = edges[mst_edges_count:] # MST에 사용되지 않은 엣지
     np.random.shuffle(remaining_edges) # 무작위로 섞음
     
     num_extra_connections = int(len(remaining_edges) * extra_connection_prob) # 추가할 연결 수
@@ -98,61 +143,111 @@ def generate_dungeon(width, height, room_count=8, room_min=8, room_max=15, min_r
         print(f"곁가지 복도 시도: 방 {i} <-> 방 {j}")
         corridor_width = np.random.choice(corridor_width_options)
         points = create_corridor(dungeon, x1, y1, x2, y2, corridor_width)
-        if points: corridors.append(points)
+        if points.size: corridors.append(points)
 
     return dungeon, rooms, corridors
 
+def bresenham_line(y0, x0, y1, x1):
+    """(y0, x0)~(y1, x1) 직선이 지나는 격자 칸을 (ys, xs) 정수 배열로 한 번에 반환 (linspace + 반올림 방식 브레즌햄)"""
+    n = max(abs(y1 - y0), abs(x1 - x0)) + 1
+    ys = np.rint(np.linspace(y0, y1, n)).astype(np.int32)
+    xs = np.rint(np.linspace(x0, x1, n)).astype(np.int32)
+    return ys, xs
+
+def carve_line(dungeon, y0, x0, y1, x1, width, thicken_x):
+    """
+    직선 복도를 width칸 두께로 파고 맵 안에 들어간 타일들의 y*map_width+x 정수 키 배열 반환
+    thicken_x=True면 x 방향(오른쪽)으로, False면 y 방향(아래쪽)으로 두께를 더함
+    """
+    height, map_width = dungeon.shape
+    ys, xs = bresenham_line(y0, x0, y1, x1)
+    offsets = np.arange(width, dtype=np.int32)
+    if thicken_x:
+        xs = (xs[:, None] + offsets).ravel()
+        ys = np.repeat(ys, width)
+    else:
+        ys = (ys[:, None] + offsets).ravel()
+        xs = np.repeat(xs, width)
+    inside = (ys >= 0) & (ys < height) & (xs >= 0) & (xs < map_width)
+    ys, xs = ys[inside], xs[inside]
+    dungeon[ys, xs] = 1
+    return ys * map_width + xs
+
 def create_corridor(dungeon, x1, y1, x2, y2, width):
     # ... (map5.py와 동일) ...
-    height, map_width = dungeon.shape
-    points = []
+    # 복도를 꺾이는 지점들 (y, x)의 목록으로 나타내고 인접한 두 지점마다 직선을 그림
+    # 구간은 수직/수평이 번갈아 나오며, 수직 구간은 x 방향, 수평 구간은 y 방향으로 width칸 두께
     
     # 복도 생성 (L자 또는 Z자)
     if np.random.rand() < 0.7: # L자
         if np.random.rand() < 0.5: # 수직->수평
-            for cy in range(min(y1, y2), max(y1, y2) + 1):
-                for offset in range(width):
-                    px = x1 + offset
-                    if 0 <= px < map_width and 0 <= cy < height: dungeon[cy, px] = 1; points.append((cy, px))
-            for cx in range(min(x1, x2), max(x1, x2) + 1):
-                 for offset in range(width):
-                    py = y2 + offset
-                    if 0 <= py < height and 0 <= cx < map_width: dungeon[py, cx] = 1; points.append((py, cx))
+            waypoints = [(y1, x1), (y2, x1), (y2, x2)]
+            vertical_first = True
         else: # 수평->수직
-            for cx in range(min(x1, x2), max(x1, x2) + 1):
-                for offset in range(width):
-                    py = y1 + offset
-                    if 0 <= py < height and 0 <= cx < map_width: dungeon[py, cx] = 1; points.append((py, cx))
-            for cy in range(min(y1, y2), max(y1, y2) + 1):
-                 for offset in range(width):
-                    px = x2 + offset
-                    if 0 <= px < map_width and 0 <= cy < height: dungeon[cy, px] = 1; points.append((cy, px))
+            waypoints = [(y1, x1), (y1, x2), (y2, x2)]
+            vertical_first = False
     else: # Z자
         mid_x = np.random.randint(min(x1, x2), max(x1, x2) + 1) if x1 != x2 else x1
         mid_y = np.random.randint(min(y1, y2), max(y1, y2) + 1) if y1 != y2 else y1
-        # y1 -> mid_y (수직)
-        for cy in range(min(y1, mid_y), max(y1, mid_y) + 1):
-            for offset in range(width):
-                px = x1 + offset
-                if 0 <= px < map_width and 0 <= cy < height: dungeon[cy, px] = 1; points.append((cy, px))
-        # x1 -> mid_x (수평, mid_y)
-        for cx in range(min(x1, mid_x), max(x1, mid_x) + 1):
-            for offset in range(width):
-                py = mid_y + offset
-                if 0 <= py < height and 0 <= cx < map_width: dungeon[py, cx] = 1; points.append((py, cx))
-        # mid_y -> y2 (수직, mid_x)
-        for cy in range(min(mid_y, y2), max(mid_y, y2) + 1):
-            for offset in range(width):
-                px = mid_x + offset
-                if 0 <= px < map_width and 0 <= cy < height: dungeon[cy, px] = 1; points.append((cy, px))
-        # mid_x -> x2 (수평, y2)
-        for cx in range(min(mid_x, x2), max(mid_x, x2) + 1):
-             for offset in range(width):
-                py = y2 + offset
-                if 0 <= py < height and 0 <= cx < map_width: dungeon[py, cx] = 1; points.append((py, cx))
-
-    # 중복 제거 후 반환
-    return list(set(points))
+        # y1 -> mid_y (수직), x1 -> mid_x (수평, mid_y), mid_y -> y2 (수직, mid_x), mid_x -> x2 (수평, y2)
+        waypoints = [(y1, x1), (mid_y, x1), (mid_y, mid_x), (y2, mid_x), (y2, x2)]
+        vertical_first = True
+
+    segments = [carve_line(dungeon, ya, xa, yb, xb, width, thicken_x=(k % 2 == 0) == vertical_first)
+                for k, ((ya, xa), (yb, xb)) in enumerate(zip(waypoints, waypoints[1:]))]
+
+    # 중복 제거 후 반환 (튜플 해싱 대신 정수 키 정렬로 처리, 좌표는 divmod(키, width)로 복원)
+    return np.unique(np.concatenate(segments))
+
+def _corridor_features(dungeon, height_map, feature_map, corridor_mask, interior_mask,
+                       corridor_h_draws, obstacle_rolls, obstacle_h_draws,
+                       corridor_h_min, corridor_h_max, obstacle_prob):
+    """
+    복도 타일(방 내부 제외)의 높이를 정하고 장애물/다리 특성을 height_map, feature_map에 직접 기록
+    난수는 칸별로 미리 뽑아 둔 격자에서 읽으므로 numba로 컴파일 가능
+    """
+    height, width = dungeon.shape
+    for r in range(height):
+        for c in range(width):
+            if dungeon[r, c] != 1 or not corridor_mask[r, c] or interior_mask[r, c]:
+                continue
+            
+            # 복도 높이 설정
+            if height_map[r, c] == 0:
+                height_map[r, c] = corridor_h_draws[r, c]
+            else:
+                height_map[r, c] = max(corridor_h_min, min(corridor_h_max, height_map[r, c]))
+
+            # 장애물 생성
+            if obstacle_rolls[r, c] < obstacle_prob:
+                is_surrounded = True
+                for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                    nr, nc = r + dr, c + dc
+                    if not (0 <= nr < height and 0 <= nc < width and dungeon[nr, nc] == 1 and corridor_mask[nr, nc]):
+                        is_surrounded = False
+                        break
+                if is_surrounded:
+                    height_map[r, c] += obstacle_h_draws[r, c]
+                    feature_map[r, c] = FEATURE_OBSTACLE
+                    
+            # 다리 지형 감지 (장애물이 아닐 경우)
+            elif feature_map[r, c] == FEATURE_NONE:
+                h_neighbors = 0
+                v_neighbors = 0
+                # (numpy bool끼리 더하면 논리합이 되므로 정수로 바꿔서 개수를 셈)
+                if 0 < c < width - 1:
+                    h_neighbors = int(dungeon[r, c-1] == 1) + int(dungeon[r, c+1] == 1)
+                if 0 < r < height - 1:
+                    v_neighbors = int(dungeon[r-1, c] == 1) + int(dungeon[r+1, c] == 1)
+                # 정확히 2개의 이웃이 있고, 수평/수직 중 하나로만 연결됨
+                if h_neighbors + v_neighbors == 2 and h_neighbors != 1:
+                    below_empty = r + 1 < height and dungeon[r+1, c] == 0
+                    below_far = r + 1 < height and dungeon[r+1, c] == 1 and height_map[r, c] - height_map[r+1, c] > 5
+                    if below_empty or below_far:
+                        feature_map[r, c] = FEATURE_BRIDGE
+
+if njit is not None:
+    _corridor_features = njit(cache=True)(_corridor_features)
 
 def generate_height_map(dungeon, rooms, corridors, smoothness=3, max_height=15, 
                         corridor_height_range=(1, 4), obstacle_prob=0.05, obstacle_height_range=(1, 3),
@@ -160,111 +255,91 @@ def generate_height_map(dungeon, rooms, corridors, smoothness=3, max_height=15,
     height, width = dungeon.shape
     noise = np.random.rand(height, width)
     
-    for _ in range(smoothness):
-        noise = (noise + np.roll(noise, 1, axis=0) + np.roll(noise, -1, axis=0) +
-                 np.roll(noise, 1, axis=1) + np.roll(noise, -1, axis=1)) / 5
+    # 경계는 순환(wrap) - scipy가 있으면 두 버퍼를 번갈아 출력으로 써서 반복마다 새 배열을 만들지 않음
+    if convolve is not None:
+        buf = np.empty_like(noise)
+        for _ in range(smoothness):
+            convolve(noise, SMOOTH_KERNEL, output=buf, mode='wrap')
+            noise, buf = buf, noise
+    else:
+        for _ in range(smoothness):
+            noise = (noise + np.roll(noise, 1, axis=0) + np.roll(noise, -1, axis=0) +
+                     np.roll(noise, 1, axis=1) + np.roll(noise, -1, axis=1)) / 5
     
     height_map = (noise * max_height).astype(int) * (dungeon == 1)
     feature_map = np.zeros_like(dungeon, dtype=int)
     
     room_heights = np.random.randint(1, max_height + 1, size=len(rooms))
     
-    # 방 내부 높이 설정
+    # 방 내부(가장자리 제외) 마스크 - 방 가장자리 판정, 복도 처리, 보물 배치에 함께 사용
+    # (방끼리는 겹치지 않으므로 방 영역 안에서 내부가 아닌 칸이 곧 그 방의 가장자리)
+    interior_mask = np.zeros((height, width), dtype=np.bool_)
+    for rx, ry, rw, rh in rooms:
+        interior_mask[ry+1:ry+rh-1, rx+1:rx+rw-1] = True
+    
+    # 방 내부 높이 설정 - 가장자리(-1~1)/안쪽(-1~0) 변화량은 맵 크기 격자로 한 번씩만 뽑고
+    # 방마다 기본 높이만 슬라이스로 채운 뒤 방 바닥 타일 전체에 한 번에 기록
+    room_mask = np.zeros((height, width), dtype=bool)
+    base_grid = np.zeros((height, width), dtype=int)
     for i, (x, y, w, h) in enumerate(rooms):
-        base_height = room_heights[i]
-        for ry in range(y, y + h):
-            for rx in range(x, x + w):
-                if dungeon[ry, rx] == 1:
-                    is_edge = rx == x or rx == x + w - 1 or ry == y or ry == y + h - 1
-                    height_map[ry, rx] = max(1, base_height + (np.random.randint(-1, 2) if is_edge else np.random.randint(-1, 1)))
+        room_mask[y:y+h, x:x+w] = True
+        base_grid[y:y+h, x:x+w] = room_heights[i]
+    edge_noise = np.random.randint(-1, 2, size=(height, width))
+    inner_noise = np.random.randint(-1, 1, size=(height, width))
+    room_tiles = room_mask & (dungeon == 1)
+    room_noise = np.where(interior_mask, inner_noise, edge_noise)
+    height_map[room_tiles] = np.maximum(1, base_grid + room_noise)[room_tiles]
 
     # 복도 높이 및 장애물/다리 특성 설정
-    all_corridor_points = set(itertools.chain(*corridors)) if corridors else set()
-    for r in range(height):
-        for c in range(width):
-            if dungeon[r, c] == 1 and (r, c) in all_corridor_points:
-                 is_in_room_interior = False
-                 for rx, ry, rw, rh in rooms:
-                     if rx < c < rx + rw -1 and ry < r < ry + rh -1: is_in_room_interior = True; break
-                 
-                 if not is_in_room_interior:
-                    # 복도 높이 설정
-                    if height_map[r, c] == 0:
-                       height_map[r, c] = np.random.randint(corridor_height_range[0], corridor_height_range[1] + 1)
-                    else:
-                       height_map[r, c] = max(corridor_height_range[0], min(corridor_height_range[1], height_map[r, c]))
-
-                    # 장애물 생성
-                    if np.random.rand() < obstacle_prob:
-                         is_surrounded = True
-                         for dr, dc in [(-1,0), (1,0), (0,-1), (0,1)]:
-                             nr, nc = r + dr, c + dc
-                             if not (0 <= nr < height and 0 <= nc < width and dungeon[nr, nc] == 1 and (nr, nc) in all_corridor_points):
-                                 is_surrounded = False; break
-                         if is_surrounded:
-                            height_map[r, c] += np.random.randint(obstacle_height_range[0], obstacle_height_range[1] + 1)
-                            feature_map[r, c] = FEATURE_OBSTACLE
-                            # print(f"복도 장애물 추가: ({r}, {c})")
-                            
-                    # 다리 지형 감지 (장애물이 아닐 경우)
-                    elif feature_map[r, c] == FEATURE_NONE: 
-                        is_narrow = False
-                        h_neighbors = (dungeon[r, c-1] == 1) + (dungeon[r, c+1] == 1) if 0 < c < width - 1 else 0
-                        v_neighbors = (dungeon[r-1, c] == 1) + (dungeon[r+1, c] == 1) if 0 < r < height - 1 else 0
-                        if h_neighbors + v_neighbors == 2 and h_neighbors != 1: # 정확히 2개의 이웃이 있고, 수평/수직 중 하나로만 연결됨
-                            is_narrow = True
-                            
-                        if is_narrow:
-                             below_empty = (r + 1 < height and dungeon[r+1, c] == 0)
-                             below_far = (r + 1 < height and dungeon[r+1, c] == 1 and height_map[r, c] - height_map[r+1, c] > 5)
-                             if below_empty or below_far:
-                                 feature_map[r, c] = FEATURE_BRIDGE
-                                 # print(f"다리 지형 감지: ({r}, {c})")
+    # 모든 복도의 정수 키를 이어 붙여 평탄화한 불리언 마스크에 팬시 인덱싱 한 번으로 표시
+    corridor_mask = np.zeros(height * width, dtype=np.bool_)
+    if corridors:
+        corridor_mask[np.concatenate(corridors)] = True
+    corridor_mask = corridor_mask.reshape(height, width)
+    
+    # 칸마다 쓸 수 있는 난수를 미리 격자로 뽑아 두고 (컴파일된 루프 안에서는 numpy 전역 시드를 따르지 않으므로) 루프에 전달
+    corridor_h_draws = np.random.randint(corridor_height_range[0], corridor_height_range[1] + 1, size=(height, width))
+    obstacle_rolls = np.random.rand(height, width)
+    obstacle_h_draws = np.random.randint(obstacle_height_range[0], obstacle_height_range[1] + 1, size=(height, width))
+    
+    _corridor_features(dungeon, height_map, feature_map, corridor_mask, interior_mask,
+                       corridor_h_draws, obstacle_rolls, obstacle_h_draws,
+                       corridor_height_range[0], corridor_height_range[1], obstacle_prob)
 
     # ===== 보물 배치 (방 내부) =====
-    for i, (x, y, w, h) in enumerate(rooms):
-        for ry in range(y + 1, y + h - 1): # 방 내부 순회 (가장자리 제외)
-            for rx in range(x + 1, x + w - 1):
-                if dungeon[ry, rx] == 1 and feature_map[ry, rx] == FEATURE_NONE: # 바닥이고 다른 특성 없을 때
-                    if np.random.rand() < treasure_prob:
-                        feature_map[ry, rx] = FEATURE_TREASURE
-                        print(f"보물 추가: ({ry}, {rx})")
+    # 복도 처리에 쓴 방 내부(가장자리 제외) 마스크를 그대로 재사용 - 바닥이고 다른 특성 없을 때
+    treasure_mask = interior_mask & (dungeon == 1) & (feature_map == FEATURE_NONE)
+    treasure_mask &= np.random.rand(height, width) < treasure_prob
+    feature_map[treasure_mask] = FEATURE_TREASURE
+    for ry, rx in np.argwhere(treasure_mask).tolist():
+        print(f"보물 추가: ({ry}, {rx})")
 
     # ===== 함정(Trap) 및 비밀(Secret Hint) 배치 =====
-    all_dungeon_points = np.argwhere(dungeon == 1)
-    for y, x in all_dungeon_points:
-        if feature_map[y, x] != FEATURE_NONE: continue # 이미 특성 있으면 건너뜀
-            
-        live_neighbors = 0
-        is_on_edge = False
-        for dy, dx in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-             ny, nx = y + dy, x + dx
-             if 0 <= ny < height and 0 <= nx < width and dungeon[ny, nx] == 1:
-                 live_neighbors += 1
-             else: # 벽에 인접한 경우
-                 is_on_edge = True 
-                 
-        # 더 정확한 가장자리 확인 (대각선 포함)
-        if not is_on_edge:
-             for dy, dx in [(-1,-1), (-1,1), (1,-1), (1,1)]:
-                  ny, nx = y + dy, x + dx
-                  if not (0 <= ny < height and 0 <= nx < width and dungeon[ny, nx] == 1):
-                      is_on_edge = True; break
-
-        # 비밀 힌트: 막다른 길
-        if live_neighbors == 1:
-             if np.random.rand() < secret_hint_prob:
-                 feature_map[y, x] = FEATURE_SECRET_HINT
-                 print(f"비밀 힌트 추가: ({y}, {x})")
-        # 함정: 복도(이웃 2) 또는 가장자리(이웃 3 이상 & 벽 근처)
-        elif live_neighbors >= 2 : 
-             if is_on_edge or live_neighbors == 2: # 복도이거나 (방/복도)가장자리
-                  if np.random.rand() < trap_prob:
-                      feature_map[y, x] = FEATURE_TRAP
-                      print(f"함정 추가: ({y}, {x})")
-
-    # 높이 최소값 보정
-    height_map = np.maximum(height_map, 1) * (dungeon == 1)
+    # 맵 밖은 벽으로 보도록 0으로 패딩한 뒤 이웃 칸을 슬라이스로 더해 상하좌우/대각선 바닥 개수를 한 번에 계산
+    floor = dungeon == 1
+    padded = np.pad(floor, 1, constant_values=False).astype(np.int8)
+    live_neighbors = padded[:-2, 1:-1] + padded[2:, 1:-1] + padded[1:-1, :-2] + padded[1:-1, 2:]
+    diag_neighbors = padded[:-2, :-2] + padded[:-2, 2:] + padded[2:, :-2] + padded[2:, 2:]
+    is_on_edge = (live_neighbors + diag_neighbors) < 8 # 대각선 포함 주변 8칸 중 벽이 하나라도 있음
+    candidates = floor & (feature_map == FEATURE_NONE) # 이미 특성 있으면 건너뜀
+    feature_rolls = np.random.rand(height, width)
+
+    # 비밀 힌트: 막다른 길
+    secret_mask = candidates & (live_neighbors == 1) & (feature_rolls < secret_hint_prob)
+    # 함정: 복도(이웃 2) 또는 가장자리(이웃 3 이상 & 벽 근처)
+    trap_mask = candidates & (live_neighbors >= 2) & (is_on_edge | (live_neighbors == 2)) & (feature_rolls < trap_prob)
+    feature_map[secret_mask] = FEATURE_SECRET_HINT
+    feature_map[trap_mask] = FEATURE_TRAP
+
+    for y, x in np.argwhere(secret_mask | trap_mask).tolist():
+        if secret_mask[y, x]:
+            print(f"비밀 힌트 추가: ({y}, {x})")
+        else:
+            print(f"함정 추가: ({y}, {x})")
+
+    # 높이 최소값 보정 (임시 배열 없이 제자리에서 최소 1로 올리고 바닥이 아닌 칸은 0)
+    np.maximum(height_map, 1, out=height_map)
+    height_map[dungeon != 1] = 0
     return height_map, feature_map
 
 def select_entrance_exit(dungeon, rooms, height_map, feature_map):
@@ -332,46 +407,122 @@ def select_entrance_exit(dungeon, rooms, height_map, feature_map):
 
     return entrance, exit_coords
 
+def _bfs_flat(walkable, heights, width, start, goal, max_height_diff):
+    """
+    1차원으로 펼친 격자(인덱스 = y*width + x)에서 BFS 수행
+    고정 크기 배열 큐와 부모 인덱스 배열을 사용하므로 numba로 컴파일 가능
+    반환: (부모 인덱스 배열, 방문 여부 배열, 출구 도달 여부)
+    """
+    n = walkable.shape[0]
+    height = n // width
+    queue = np.empty(n, dtype=np.int32)
+    parents = np.full(n, -1, dtype=np.int32)
+    visited = np.zeros(n, dtype=np.bool_)
+    
+    head = 0
+    tail = 0
+    queue[tail] = start
+    tail += 1
+    visited[start] = True
+    
+    while head < tail:
+        c = queue[head]
+        head += 1
+        
+        # 출구에 도달한 경우
+        if c == goal:
+            return parents, visited, True
+        
+        y = c // width
+        x = c - y * width
+        
+        # 인접한 타일로 이동 (상, 하, 좌, 우)
+        for k in range(4):
+            if k == 0:
+                if y == 0:
+                    continue
+                nc = c - width
+            elif k == 1:
+                if y == height - 1:
+                    continue
+                nc = c + width
+            elif k == 2:
+                if x == 0:
+                    continue
+                nc = c - 1
+            else:
+                if x == width - 1:
+                    continue
+                nc = c + 1
+            
+            # 던전 타일이며 아직 방문하지 않았고 높이 차이가 허용 범위인 경우
+            if walkable[nc] and not visited[nc] and abs(heights[nc] - heights[c]) <= max_height_diff:
+                visited[nc] = True
+                parents[nc] = c
+                queue[tail] = nc
+                tail += 1
+    
+    return parents, visited, False
+
+if njit is not None:
+    _bfs_flat = njit(cache=True)(_bfs_flat)
+
 def find_path_bfs(dungeon, height_map, feature_map, entrance, exit_coords, max_height_diff=4):
     # ... (map5.py와 거의 동일, 경로 특성 부여 로직 유지) ...
     if entrance is None or exit_coords is None: return None, None
 
     height, width = dungeon.shape
-    visited = np.zeros_like(dungeon, dtype=bool)
-    parent = {} # 경로 역추적용
-    queue = deque([(entrance[0], entrance[1])])
 
     if not (0 <= entrance[0] < height and 0 <= entrance[1] < width and dungeon[entrance[0], entrance[1]] == 1):
         print(f"오류: 입구 {entrance}가 유효하지 않습니다.")
-        q = deque([entrance]); visited_start_find = {entrance}; new_entrance = None
+        # 맵 밖 좌표면 가장 가까운 맵 안 칸에서 시작하고, 방문 여부는 좌표 집합 대신 불리언 격자로 관리
+        start = (min(max(entrance[0], 0), height - 1), min(max(entrance[1], 0), width - 1))
+        q = deque([start]); new_entrance = None
+        visited_start_find = np.zeros((height, width), dtype=bool)
+        visited_start_find[start] = True
         while q:
             y, x = q.popleft()
-            if 0 <= y < height and 0 <= x < width and dungeon[y,x] == 1:
+            if dungeon[y,x] == 1:
                 new_entrance = (y,x); break
             for dy, dx in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
                  ny, nx = y+dy, x+dx
-                 if (ny, nx) not in visited_start_find:
-                     q.append((ny,nx)); visited_start_find.add((ny,nx))
-        if new_entrance: print(f"가장 가까운 유효 입구 {new_entrance}로 변경."); entrance = new_entrance; queue = deque([entrance])
+                 if 0 <= ny < height and 0 <= nx < width and not visited_start_find[ny, nx]:
+                     visited_start_find[ny, nx] = True; q.append((ny,nx))
+        if new_entrance: print(f"가장 가까운 유효 입구 {new_entrance}로 변경."); entrance = new_entrance
         else: print("유효 입구를 찾을 수 없습니다."); return None, None
-             
-    visited[entrance[0], entrance[1]] = True
     
     directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-    path_found = False
+    # 좌표는 y*width + x 정수 인덱스로 다루고, 경로는 부모 인덱스 배열로 마지막에 한 번만 복원
+    start = entrance[0] * width + entrance[1]
+    goal = exit_coords[0] * width + exit_coords[1]
     
-    while queue:
-        y, x = queue.popleft()
-        if (y, x) == exit_coords: path_found = True; break
-        current_h = height_map[y, x] if height_map[y, x] > 0 else 1
-        for dy, dx in directions:
-            ny, nx = y + dy, x + dx
-            if (0 <= ny < height and 0 <= nx < width and dungeon[ny, nx] == 1 and not visited[ny, nx]):
-                next_h = height_map[ny, nx] if height_map[ny, nx] > 0 else 1
-                if abs(next_h - current_h) <= max_height_diff:
-                    visited[ny, nx] = True
-                    queue.append((ny, nx))
-                    parent[(ny, nx)] = (y, x)
+    if njit is not None:
+        # numba 컴파일된 BFS 사용 (높이 0은 1로 간주)
+        # 재시도마다 호출되므로 높이는 np.maximum 결과 한 벌만 만들고 (이미 int64면 astype 복사 생략) 그대로 펼쳐 전달
+        parents, visited_flat, path_found = _bfs_flat(
+            np.ascontiguousarray(dungeon == 1).ravel(),
+            np.maximum(height_map, 1).astype(np.int64, copy=False).ravel(),
+            width, start, goal, max_height_diff)
+        visited = visited_flat.reshape(height, width)
+    else:
+        visited = np.zeros_like(dungeon, dtype=bool)
+        parents = np.full(height * width, -1, dtype=np.int32)
+        queue = deque([(entrance[0], entrance[1])])
+        visited[entrance[0], entrance[1]] = True
+        path_found = False
+        
+        while queue:
+            y, x = queue.popleft()
+            if (y, x) == exit_coords: path_found = True; break
+            current_h = height_map[y, x] if height_map[y, x] > 0 else 1
+            for dy, dx in directions:
+                ny, nx = y + dy, x + dx
+                if (0 <= ny < height and 0 <= nx < width and dungeon[ny, nx] == 1 and not visited[ny, nx]):
+                    next_h = height_map[ny, nx] if height_map[ny, nx] > 0 else 1
+                    if abs(next_h - current_h) <= max_height_diff:
+                        visited[ny, nx] = True
+                        queue.append((ny, nx))
+                        parents[ny * width + nx] = y * width + x
     
     if not path_found:
         problematic_points = []
@@ -386,14 +537,17 @@ def find_path_bfs(dungeon, height_map, feature_map, entrance, exit_coords, max_h
                         problematic_points.append(((y, x), (ny, nx), abs(next_h - current_h)))
         return None, problematic_points
 
-    path = []; curr = exit_coords
-    while curr != entrance:
-        path.append(curr)
-        # 경로 특성 부여 (기존 특성 덮어쓰지 않음 - 입구/출구/함정 등 유지)
-        if feature_map[curr[0], curr[1]] == FEATURE_NONE:
-             feature_map[curr[0], curr[1]] = FEATURE_PATH 
-        curr = parent[curr]
-    path.append(entrance); path.reverse()
+    path = []; c = goal
+    while c != -1:
+        path.append(divmod(int(c), width))
+        c = parents[c]
+    path.reverse()
+    
+    # 경로 특성 부여 (기존 특성 덮어쓰지 않음 - 입구/출구/함정 등 유지) - 팬시 인덱싱으로 한 번에 기록
+    path_arr = np.array(path, dtype=np.int32)
+    ys, xs = path_arr[:, 0], path_arr[:, 1]
+    free = feature_map[ys, xs] == FEATURE_NONE
+    feature_map[ys[free], xs[free]] = FEATURE_PATH
     
     # 입구/출구 특성 재확인 (경로 탐색 중 FEATURE_PATH로 덮어쓰였을 수 있으므로)
     feature_map[entrance[0], entrance[1]] = FEATURE_ENTRANCE
@@ -523,126 +677,109 @@ colors = ['#2c3e50', '#3498db', '#1abc9c', '#f1c40f', '#e67e22', '#e74c3c']
 cmap = LinearSegmentedColormap.from_list('custom_terrain', colors, N=256)
 
 # 타일 정보 수집 및 정렬
-tiles_to_draw = []
-for y in range(height):
-    for x in range(width):
-        if final_dungeon[y, x] == 1:
-            h = final_height_map[y, x]
-            feature = final_feature_map[y, x]
-            iso_x = (x - y) * tile_width / 2
-            iso_y = (x + y) * tile_height / 2
-            tiles_to_draw.append({'x': x, 'y': y, 'h': h, 'feature': feature, 'iso_x': iso_x, 'iso_y': iso_y})
-
-tiles_to_draw.sort(key=lambda t: (t['y'], t['x'], -t['h']))
+# 던전 타일 좌표, 높이, 특성, 아이소메트릭 좌표를 배열 연산으로 한 번에 계산해 레코드 배열로 보관
+tile_ys, tile_xs = np.nonzero(final_dungeon == 1)
+tiles_to_draw = np.empty(len(tile_ys), dtype=[('x', np.int64), ('y', np.int64), ('h', np.int64), ('feature', np.int64),
+                                              ('iso_x', np.float64), ('iso_y', np.float64)])
+tiles_to_draw['x'] = tile_xs
+tiles_to_draw['y'] = tile_ys
+tiles_to_draw['h'] = final_height_map[tile_ys, tile_xs]
+tiles_to_draw['feature'] = final_feature_map[tile_ys, tile_xs]
+tiles_to_draw['iso_x'] = (tile_xs - tile_ys) * tile_width / 2
+tiles_to_draw['iso_y'] = (tile_xs + tile_ys) * tile_height / 2
+
+# 그리기 순서 정렬 (y좌표 -> x좌표 -> 높이 역순, lexsort는 마지막 키가 1순위)
+tiles_to_draw = tiles_to_draw[np.lexsort((-tiles_to_draw['h'], tiles_to_draw['x'], tiles_to_draw['y']))]
 
 # 타일 그리기 및 텍스트 추가
 max_h_val = max(1, final_height_map.max())
 feature_texts = [] # 텍스트 겹침 방지용
 
-for tile in tiles_to_draw:
-    x, y, h, feature = tile['x'], tile['y'], tile['h'], tile['feature']
-    iso_x, iso_y = tile['iso_x'], tile['iso_y']
-    
-    normalized_height = h / max_h_val
-    base_color = cmap(normalized_height)
-    
-    top_y_offset = iso_y - h * height_scale
-    top_coord = (iso_x, top_y_offset)
-    right_coord = (iso_x + tile_width/2, top_y_offset + tile_height/2)
-    bottom_coord = (iso_x, top_y_offset + tile_height)
-    left_coord = (iso_x - tile_width/2, top_y_offset + tile_height/2)
-    
-    # 옆면 기본 색상
-    left_side_color = tuple(c*0.5 for c in base_color[:3]) + (base_color[3],)
-    right_side_color = tuple(c*0.7 for c in base_color[:3]) + (base_color[3],)
-    
-    # 윗면 기본 설정
-    tile_face_color = base_color
-    tile_edge_color = 'black'
-    tile_linewidth = 0.5
-    text_label = None
-    text_color = 'white'
-    
-    # ===== 특성별 처리 =====
-    if feature == FEATURE_BRIDGE:
-         # 다리 옆면 색상 (나무/돌 느낌)
-         left_side_color = '#A0522D' # 중간 갈색
-         right_side_color = '#8B4513' # 어두운 갈색
-         # 다리 윗면
-         tile_face_color = '#D2B48C' # 연한 갈색 (나무 판자)
-         tile_edge_color = '#8B4513' # 어두운 갈색 테두리
-         tile_linewidth = 1.2 # 테두리 굵게
-         text_label = 'B'
-         text_color = 'black'
-    elif feature == FEATURE_ENTRANCE:
-        tile_face_color = 'lime'
-        tile_linewidth = 1.5
-        text_label = 'E'
-        text_color = 'black'
-    elif feature == FEATURE_EXIT:
-        tile_face_color = 'red'
-        tile_linewidth = 1.5
-        text_label = 'X'
-        text_color = 'black'
-        # 출구 강조 테두리 (윗면 그린 후 추가)
-    elif feature == FEATURE_PATH:
-        tile_face_color = 'yellow'
-        tile_linewidth = 0.8
-    elif feature == FEATURE_TRAP:
-        tile_edge_color = 'red'
-        tile_linewidth = 1.0
-        text_label = 'T'
-        text_color = 'red'
-    elif feature == FEATURE_SECRET_HINT:
-        tile_edge_color = 'blue'
-        tile_linewidth = 1.0
-        text_label = '?'
-        text_color = 'blue'
-    elif feature == FEATURE_OBSTACLE:
-        tile_edge_color = 'gray'
-        tile_linewidth = 1.0
-        text_label = 'O'
-        text_color = 'dimgray'
-    elif feature == FEATURE_TREASURE:
-        tile_face_color = 'gold' # 금색 타일
-        tile_edge_color = 'darkorange' # 주황색 테두리
-        tile_linewidth = 1.0
-        text_label = '$' # 보물 마커
-        text_color = 'black'
-        
-    # 옆면 그리기 (높이가 있을 때)
-    if h > 0:
-        left_side_coords = [left_coord, (left_coord[0], iso_y + tile_height/2), (iso_x, iso_y + tile_height), bottom_coord]
-        left_poly = Polygon(left_side_coords, closed=True, facecolor=left_side_color, edgecolor='black', linewidth=0.3)
-        ax.add_patch(left_poly)
-        
-        right_side_coords = [bottom_coord, (iso_x, iso_y + tile_height), (right_coord[0], iso_y + tile_height/2), right_coord]
-        right_poly = Polygon(right_side_coords, closed=True, facecolor=right_side_color, edgecolor='black', linewidth=0.3)
-        ax.add_patch(right_poly)
-
-    # 윗면 그리기
-    top_poly_coords = [top_coord, right_coord, bottom_coord, left_coord]
-    top_poly = Polygon(top_poly_coords, closed=True, facecolor=tile_face_color, edgecolor=tile_edge_color, linewidth=tile_linewidth)
-    ax.add_patch(top_poly)
-
-    # 출구 강조 테두리 (윗면 그린 후에)
-    if feature == FEATURE_EXIT:
-        border_poly = Polygon(top_poly_coords, closed=True, facecolor='none', edgecolor='yellow', linewidth=2.5)
-        ax.add_patch(border_poly)
-        
-    # 텍스트 레이블 추가 (겹침 방지)
-    if text_label:
-         text_x = iso_x
-         text_y = top_y_offset - tile_height * 0.1
-         can_draw = True
-         for tx, ty, _ in feature_texts:
-              if abs(text_x - tx) < tile_width * 0.4 and abs(text_y - ty) < tile_height * 0.4:
-                   can_draw = False; break
-         if can_draw:
-              ax.text(text_x, text_y, text_label, ha='center', va='center', 
-                      fontsize=8, color=text_color, fontweight='bold',
-                      bbox=dict(boxstyle='circle,pad=0.1', fc='white', alpha=0.6, ec='none'))
-              feature_texts.append((text_x, text_y, text_label))
+# 높이는 0~max_h_val 정수이므로 높이별 색상을 미리 한 번에 계산해 두고 조회
+color_lut = cmap(np.arange(max_h_val + 1) / max_h_val)
+
+# 특성별 표시 설정: (윗면 색, 윗면 테두리 색, 테두리 굵기, 레이블, 레이블 색, (왼쪽 면 색, 오른쪽 면 색))
+# 윗면 색이 None이면 높이 색상, 옆면 색이 None이면 높이 색상을 어둡게 한 기본 옆면 사용
+FEATURE_STYLES = {
+    FEATURE_BRIDGE: ('#D2B48C', '#8B4513', 1.2, 'B', 'black', ('#A0522D', '#8B4513')), # 나무 판자 / 갈색 옆면
+    FEATURE_ENTRANCE: ('lime', 'black', 1.5, 'E', 'black', None),
+    FEATURE_EXIT: ('red', 'black', 1.5, 'X', 'black', None),
+    FEATURE_PATH: ('yellow', 'black', 0.8, None, None, None),
+    FEATURE_TRAP: (None, 'red', 1.0, 'T', 'red', None),
+    FEATURE_SECRET_HINT: (None, 'blue', 1.0, '?', 'blue', None),
+    FEATURE_OBSTACLE: (None, 'gray', 1.0, 'O', 'dimgray', None),
+    FEATURE_TREASURE: ('gold', 'darkorange', 1.0, '$', 'black', None), # 금색 타일 / 주황색 테두리
+}
+
+# 대부분을 차지하는 특성 없는 바닥 타일은 기본 설정 그대로이므로 타일별 분기 없이 배열 연산으로 한 번에 면을 만들고,
+# 특성이 있는 타일만 마스크로 골라 색상/굵기를 덮어씀
+n_tiles = len(tiles_to_draw)
+tile_hs = tiles_to_draw['h']
+tile_features = tiles_to_draw['feature']
+iso_x = tiles_to_draw['iso_x']
+iso_y = tiles_to_draw['iso_y']
+top_y_offset = iso_y - tile_hs * height_scale
+top_coord = np.stack([iso_x, top_y_offset], axis=-1)
+right_coord = np.stack([iso_x + tile_width/2, top_y_offset + tile_height/2], axis=-1)
+bottom_coord = np.stack([iso_x, top_y_offset + tile_height], axis=-1)
+left_coord = np.stack([iso_x - tile_width/2, top_y_offset + tile_height/2], axis=-1)
+ground_left = np.stack([left_coord[:, 0], iso_y + tile_height/2], axis=-1)
+ground_bottom = np.stack([iso_x, iso_y + tile_height], axis=-1)
+ground_right = np.stack([right_coord[:, 0], iso_y + tile_height/2], axis=-1)
+top_poly_coords = np.stack([top_coord, right_coord, bottom_coord, left_coord], axis=1)
+
+# 타일마다 면 슬롯 4개: [왼쪽 면, 오른쪽 면, 윗면, 출구 강조 테두리 (윗면 그린 후에)]
+# 쓰지 않는 슬롯을 마스크로 빼고 행 우선으로 펼치면 타일별 그리기 순서가 그대로 유지됨
+face_verts = np.stack([
+    np.stack([left_coord, ground_left, ground_bottom, bottom_coord], axis=1),
+    np.stack([bottom_coord, ground_bottom, ground_right, right_coord], axis=1),
+    top_poly_coords,
+    top_poly_coords,
+], axis=1) # (타일 수, 4, 꼭짓점 4, 2)
+has_sides = tile_hs > 0 # 옆면은 높이가 있을 때만
+is_exit = tile_features == FEATURE_EXIT
+face_used = np.stack([has_sides, has_sides, np.ones(n_tiles, dtype=bool), is_exit], axis=1)
+
+# 기본 색상: 윗면은 높이 색상, 옆면은 RGB에 배율을 곱해 어둡게 (알파는 유지)
+base_colors = color_lut[tile_hs]
+face_facecolors = np.stack([base_colors * (0.5, 0.5, 0.5, 1.0), base_colors * (0.7, 0.7, 0.7, 1.0),
+                            base_colors, np.broadcast_to(to_rgba('none'), (n_tiles, 4))], axis=1)
+face_edgecolors = np.broadcast_to(to_rgba('black'), (n_tiles, 4, 4)).copy()
+face_edgecolors[:, 3] = to_rgba('yellow') # 출구 주변 강조 (노란색 테두리)
+face_linewidths = np.tile([0.3, 0.3, 0.5, 2.5], (n_tiles, 1))
+
+label_texts = np.full(n_tiles, None, dtype=object)
+label_colors = np.full(n_tiles, None, dtype=object)
+for feature, (face_color, edge_color, linewidth, text_label, text_color, side_colors) in FEATURE_STYLES.items():
+    mask = tile_features == feature
+    if not mask.any():
+        continue
+    if face_color is not None:
+        face_facecolors[mask, 2] = to_rgba(face_color)
+    if side_colors is not None:
+        face_facecolors[mask, 0] = to_rgba(side_colors[0])
+        face_facecolors[mask, 1] = to_rgba(side_colors[1])
+    face_edgecolors[mask, 2] = to_rgba(edge_color)
+    face_linewidths[mask, 2] = linewidth
+    label_texts[mask] = text_label
+    label_colors[mask] = text_color
+
+# 텍스트 레이블 추가 (겹침 방지) - 레이블이 있는 타일만 그리기 순서대로 확인
+for i in np.flatnonzero(label_texts != None):
+    text_x = iso_x[i]
+    text_y = top_y_offset[i] - tile_height * 0.1
+    can_draw = True
+    for tx, ty, _ in feature_texts:
+        if abs(text_x - tx) < tile_width * 0.4 and abs(text_y - ty) < tile_height * 0.4:
+            can_draw = False; break
+    if can_draw:
+        ax.text(text_x, text_y, label_texts[i], ha='center', va='center',
+                fontsize=8, color=label_colors[i], fontweight='bold',
+                bbox=dict(boxstyle='circle,pad=0.1', fc='white', alpha=0.6, ec='none'))
+        feature_texts.append((text_x, text_y, label_texts[i]))
+
+ax.add_collection(PolyCollection(face_verts[face_used], closed=True, facecolors=face_facecolors[face_used],
+                                 edgecolors=face_edgecolors[face_used], linewidths=face_linewidths[face_used]))
 
 # 축 범위 및 제목
 ax.autoscale_view()
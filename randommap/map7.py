@@ -7,6 +7,26 @@ import heapq
 from collections import deque
 import itertools
 
+# numba가 설치되어 있으면 방 배치 간격 검사와 BFS를 네이티브 코드로 컴파일해서 사용
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# scipy가 있으면 이웃 개수 계산을 컴파일된 합성곱으로 처리
+try:
+    from scipy.ndimage import convolve
+except ImportError:
+    convolve = None
+
+# scipy가 있으면 방 연결 후보를 들로네 삼각분할 엣지로 줄이고 MST를 minimum_spanning_tree로 계산 (없으면 모든 쌍에 크루스칼 사용)
+try:
+    from scipy.spatial import Delaunay, QhullError
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import minimum_spanning_tree
+except ImportError:
+    Delaunay = None
+
 # 폰트 설정 (한글 표시)
 plt.rcParams['font.family'] = 'Malgun Gothic'
 plt.rcParams['axes.unicode_minus'] = False
@@ -24,45 +44,108 @@ FEATURE_TREASURE = 8      # 보물
 
 # ===========================
 
+# 이웃 개수 계산용 커널 (상하좌우 / 주변 8칸 / 좌우 / 상하)
+CROSS_KERNEL = np.array([[0, 1, 0], [1, 0, 1], [0, 1, 0]], dtype=np.int8)
+RING_KERNEL = np.array([[1, 1, 1], [1, 0, 1], [1, 1, 1]], dtype=np.int8)
+H_KERNEL = np.array([[0, 0, 0], [1, 0, 1], [0, 0, 0]], dtype=np.int8)
+V_KERNEL = H_KERNEL.T.copy()
+
+def neighbor_count(mask, kernel):
+    """마스크에서 칸마다 커널이 가리키는 이웃 중 True인 칸 수를 계산 (맵 밖은 False로 간주)"""
+    mask = mask.view(np.uint8) # 불리언 마스크를 복사 없이 0/1 바이트 배열로 보고 합성곱 (개수는 최대 8)
+    if convolve is not None: return convolve(mask, kernel, mode='constant', cval=0)
+    h, w = mask.shape; padded = np.pad(mask, 1)
+    return sum(padded[dy:dy+h, dx:dx+w] * kernel[dy, dx] for dy, dx in np.argwhere(kernel))
+
+def candidate_room_pairs(centers):
+    """
+    방 연결 후보 쌍의 (i 배열, j 배열) (i < j, 사전순 정렬)
+    scipy가 있으면 방 중심의 들로네 삼각분할 엣지(약 3R개)만 사용하고,
+    없거나 삼각분할이 불가능하면(방 4개 미만, 일직선 배치 등) 모든 쌍을 사용
+    """
+    n = len(centers)
+    all_pairs = np.triu_indices(n, k=1)
+    if Delaunay is None or n < 4: return all_pairs
+    try: simplices = Delaunay(centers.astype(float)).simplices
+    except QhullError: return all_pairs
+    # 삼각형마다 세 변을 (작은 번호, 큰 번호) 쌍으로 펼친 뒤 공유 변 중복 제거
+    pairs = np.unique(np.sort(simplices[:, [[0, 1], [0, 2], [1, 2]]].reshape(-1, 2), axis=1), axis=0)
+    if len(np.unique(pairs)) < n: return all_pairs # 삼각분할에서 빠진 방이 있으면 전체 사용
+    return pairs[:, 0], pairs[:, 1]
+
+def kruskal_mst_edges(edges, n):
+    """
+    거리순으로 정렬된 (거리, i, j) 엣지 목록에서 크루스칼로 최소 신장 트리 엣지를 골라 같은 순서로 반환
+    합집합-찾기(경로 압축)로 사이클을 판정하고, n-1개를 고르면 바로 종료
+    """
+    parent = list(range(n))
+    def find(a):
+        while parent[a] != a: parent[a] = parent[parent[a]]; a = parent[a]
+        return a
+    mst_edges = []
+    for edge in edges:
+        root_i, root_j = find(edge[1]), find(edge[2])
+        if root_i == root_j: continue
+        parent[root_i] = root_j; mst_edges.append(edge)
+        if len(mst_edges) == n - 1: break
+    return mst_edges
+
+def _place_rooms(candidates, room_count, min_room_distance):
+    """
+    후보 방 (x, y, w, h) 배열을 순서대로 검사해 이미 놓인 방들과 min_room_distance 이상 떨어진 것만 채택
+    난수는 밖에서 미리 뽑아 넘기므로 numba로 컴파일 가능
+    반환: (채택된 방 (room_count, 4) int32 배열, 채택 개수)
+    """
+    rooms = np.empty((room_count, 4), dtype=np.int32)
+    n = 0
+    for k in range(candidates.shape[0]):
+        if n >= room_count: break
+        x, y, w, h = candidates[k, 0], candidates[k, 1], candidates[k, 2], candidates[k, 3]
+        too_close = False
+        for i in range(n):
+            rx, ry, rw, rh = rooms[i, 0], rooms[i, 1], rooms[i, 2], rooms[i, 3]
+            if (x + w + min_room_distance > rx and rx + rw + min_room_distance > x and
+                    y + h + min_room_distance > ry and ry + rh + min_room_distance > y):
+                too_close = True; break
+        if too_close: continue
+        rooms[n] = candidates[k]; n += 1
+    return rooms, n
+
+if njit is not None:
+    _place_rooms = njit(cache=True)(_place_rooms)
+
 # 던전과 높이 맵 생성 함수
 def generate_dungeon(width, height, room_count=8, room_min=8, room_max=15, min_room_distance=4, corridor_width_options=[1, 2], extra_connection_prob=0.3):
     # ... (map6.py와 동일) ...
-    dungeon = np.zeros((height, width), dtype=int)
-    rooms = []
-    attempts = 0
+    dungeon = np.zeros((height, width), dtype=np.uint8) # 0/1 값만 쓰므로 1바이트 정수
     max_attempts = 200
-    while len(rooms) < room_count and attempts < max_attempts:
-        w = np.random.randint(room_min, room_max)
-        h = np.random.randint(room_min, room_max)
-        x = np.random.randint(1, width - w - 1)
-        y = np.random.randint(1, height - h - 1)
-        new_room_rect = (x, y, w, h)
-        too_close = False
-        for rx, ry, rw, rh in rooms:
-            if not (x + w + min_room_distance <= rx or rx + rw + min_room_distance <= x or
-                   y + h + min_room_distance <= ry or ry + rh + min_room_distance <= y):
-                too_close = True; break
-        attempts += 1
-        if too_close: continue
-        dungeon[y:y+h, x:x+w] = 1
-        rooms.append(new_room_rect)
+    # 모든 시도의 후보 방 크기/위치를 한 번에 뽑고 (위치 상한은 크기에 따라 다르므로 배열로 지정) 간격 검사만 루프로
+    cand_ws = np.random.randint(room_min, room_max, size=max_attempts); cand_hs = np.random.randint(room_min, room_max, size=max_attempts)
+    candidates = np.stack([np.random.randint(1, width - cand_ws - 1), np.random.randint(1, height - cand_hs - 1), cand_ws, cand_hs], axis=1).astype(np.int32)
+    rooms_arr, n_rooms = _place_rooms(candidates, room_count, min_room_distance)
+    rooms = [tuple(room) for room in rooms_arr[:n_rooms].tolist()]
+    for x, y, w, h in rooms: dungeon[y:y+h, x:x+w] = 1
     if len(rooms) < 2: print("방 부족"); return dungeon, rooms, []
-    connected = {0}; edges = []; room_centers = [(r[0] + r[2]//2, r[1] + r[3]//2) for r in rooms]
-    for i in range(len(rooms)): 
-        for j in range(i + 1, len(rooms)): 
-            dist = abs(room_centers[i][0] - room_centers[j][0]) + abs(room_centers[i][1] - room_centers[j][1])
-            edges.append((dist, i, j))
-    edges.sort(); corridors = []; mst_edges_count = 0
-    for dist, i, j in edges:
-        if len(connected) == len(rooms): break
-        if i in connected and j not in connected or i not in connected and j in connected:
-            connected.add(i); connected.add(j)
-            x1, y1 = room_centers[i]; x2, y2 = room_centers[j]
-            corridor_width = np.random.choice(corridor_width_options)
-            points = create_corridor(dungeon, x1, y1, x2, y2, corridor_width)
-            if points: corridors.append(points)
-            mst_edges_count += 1
-    remaining_edges = edges[mst_edges_count:]; np.random.shuffle(remaining_edges)
+    room_centers = [(r[0] + r[2]//2, r[1] + r[3]//2) for r in rooms]
+    # 후보 쌍의 맨해튼 거리를 브로드캐스팅 거리 행렬에서 한 번에 꺼내고 (거리, i, j) 순으로 정렬
+    centers = np.array(room_centers)
+    dist_matrix = np.abs(centers[:, None] - centers[None, :]).sum(axis=-1)
+    i_arr, j_arr = candidate_room_pairs(centers)
+    dist_arr = dist_matrix[i_arr, j_arr]
+    order = np.lexsort((j_arr, i_arr, dist_arr)); dist_arr, i_arr, j_arr = dist_arr[order], i_arr[order], j_arr[order]
+    edges = list(zip(dist_arr.tolist(), i_arr.tolist(), j_arr.tolist())); corridors = []
+    if Delaunay is not None:
+        # 후보 엣지만 넣은 희소 거리 행렬로 MST 계산 (방이 겹치지 않으므로 거리 0인 엣지는 없음)
+        mst = minimum_spanning_tree(csr_matrix((dist_arr, (i_arr, j_arr)), shape=(len(rooms), len(rooms)))).tocoo()
+        tree_pairs = {(min(i, j), max(i, j)) for i, j in zip(mst.row.tolist(), mst.col.tolist())}
+        mst_edges = [edge for edge in edges if edge[1:] in tree_pairs] # 짧은 엣지부터 복도 생성
+    else: mst_edges = kruskal_mst_edges(edges, len(rooms))
+    for dist, i, j in mst_edges:
+        x1, y1 = room_centers[i]; x2, y2 = room_centers[j]
+        corridor_width = np.random.choice(corridor_width_options)
+        points = create_corridor(dungeon, x1, y1, x2, y2, corridor_width)
+        if len(points): corridors.append(points)
+    used_edges = set(mst_edges); remaining_edges = [edge for edge in edges if edge not in used_edges]; np.random.shuffle(remaining_edges)
     num_extra_connections = int(len(remaining_edges) * extra_connection_prob)
     for k in range(min(num_extra_connections, len(remaining_edges))):
         dist, i, j = remaining_edges[k]
@@ -70,111 +153,105 @@ def generate_dungeon(width, height, room_count=8, room_min=8, room_max=15, min_r
         print(f"곁가지 복도 시도: 방 {i} <-> 방 {j}")
         corridor_width = np.random.choice(corridor_width_options)
         points = create_corridor(dungeon, x1, y1, x2, y2, corridor_width)
-        if points: corridors.append(points)
+        if len(points): corridors.append(points)
     return dungeon, rooms, corridors
 
+def _draw_segment(mask, y0, y1, x0, x1):
+    """mask[y0:y1, x0:x1] 직사각형을 맵 범위로 잘라서 True로 채움"""
+    height, width = mask.shape
+    mask[max(0, y0):min(height, y1), max(0, x0):min(width, x1)] = True
+
 def create_corridor(dungeon, x1, y1, x2, y2, width):
-    # ... (map6.py와 동일) ...
-    height, map_width = dungeon.shape; points = []
+    # 복도의 각 직선 구간을 (길이 x 너비) 직사각형 슬라이스 하나로 채움 (L자 2구간 / Z자 4구간)
+    corridor_mask = np.zeros_like(dungeon, dtype=bool) # 중복 좌표는 set 대신 격자 마스크로 제거
     if np.random.rand() < 0.7:
         if np.random.rand() < 0.5:
-            for cy in range(min(y1, y2), max(y1, y2) + 1): 
-                for offset in range(width): px=x1+offset; 
-                if 0<=px<map_width and 0<=cy<height: dungeon[cy, px]=1; points.append((cy, px))
-            for cx in range(min(x1, x2), max(x1, x2) + 1): 
-                for offset in range(width): py=y2+offset; 
-                if 0<=py<height and 0<=cx<map_width: dungeon[py, cx]=1; points.append((py, cx))
+            _draw_segment(corridor_mask, min(y1, y2), max(y1, y2) + 1, x1, x1 + width) # 세로 -> 가로
+            _draw_segment(corridor_mask, y2, y2 + width, min(x1, x2), max(x1, x2) + 1)
         else:
-            for cx in range(min(x1, x2), max(x1, x2) + 1): 
-                for offset in range(width): py=y1+offset; 
-                if 0<=py<height and 0<=cx<map_width: dungeon[py, cx]=1; points.append((py, cx))
-            for cy in range(min(y1, y2), max(y1, y2) + 1): 
-                for offset in range(width): px=x2+offset; 
-                if 0<=px<map_width and 0<=cy<height: dungeon[cy, px]=1; points.append((cy, px))
+            _draw_segment(corridor_mask, y1, y1 + width, min(x1, x2), max(x1, x2) + 1) # 가로 -> 세로
+            _draw_segment(corridor_mask, min(y1, y2), max(y1, y2) + 1, x2, x2 + width)
     else:
         mid_x = np.random.randint(min(x1,x2), max(x1,x2)+1) if x1!=x2 else x1
         mid_y = np.random.randint(min(y1,y2), max(y1,y2)+1) if y1!=y2 else y1
-        for cy in range(min(y1, mid_y), max(y1, mid_y)+1): 
-            for offset in range(width): px=x1+offset; 
-            if 0<=px<map_width and 0<=cy<height: dungeon[cy, px]=1; points.append((cy, px))
-        for cx in range(min(x1, mid_x), max(x1, mid_x)+1): 
-            for offset in range(width): py=mid_y+offset; 
-            if 0<=py<height and 0<=cx<map_width: dungeon[py, cx]=1; points.append((py, cx))
-        for cy in range(min(mid_y, y2), max(mid_y, y2)+1): 
-            for offset in range(width): px=mid_x+offset; 
-            if 0<=px<map_width and 0<=cy<height: dungeon[cy, px]=1; points.append((cy, px))
-        for cx in range(min(mid_x, x2), max(mid_x, x2)+1): 
-            for offset in range(width): py=y2+offset; 
-            if 0<=py<height and 0<=cx<map_width: dungeon[py, cx]=1; points.append((py, cx))
-    return list(set(points))
+        _draw_segment(corridor_mask, min(y1, mid_y), max(y1, mid_y) + 1, x1, x1 + width)
+        _draw_segment(corridor_mask, mid_y, mid_y + width, min(x1, mid_x), max(x1, mid_x) + 1)
+        _draw_segment(corridor_mask, min(mid_y, y2), max(mid_y, y2) + 1, mid_x, mid_x + width)
+        _draw_segment(corridor_mask, y2, y2 + width, min(mid_x, x2), max(mid_x, x2) + 1)
+    dungeon[corridor_mask] = 1
+    return np.argwhere(corridor_mask) # (N, 2) 배열, 행마다 (y, x)
+
+def smooth_noise(noise, smoothness):
+    """
+    상하좌우+자기 자신 5점 평균(경계 순환)을 smoothness번 반복한 것과 같은 결과를
+    FFT 한 번으로 계산 (순환 합성곱이므로 커널 스펙트럼을 smoothness 제곱하면 됨)
+    """
+    if smoothness <= 0: return noise
+    h, w = noise.shape
+    kernel = np.zeros((h, w))
+    for ky, kx in ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)): kernel[ky % h, kx % w] += 1 / 5
+    return np.fft.irfft2(np.fft.rfft2(noise) * np.fft.rfft2(kernel) ** smoothness, s=(h, w))
 
 def generate_height_map(dungeon, rooms, corridors, smoothness=3, max_height=15, 
                         corridor_height_range=(1, 4), obstacle_prob=0.05, obstacle_height_range=(1, 3),
                         trap_prob_base = 0.015, trap_prob_corridor_center=0.005, # 함정 확률 세분화
                         secret_hint_prob = 0.1, treasure_prob = 0.015):
     height, width = dungeon.shape
-    noise = np.random.rand(height, width)
-    for _ in range(smoothness): noise = (noise + np.roll(noise, 1, axis=0) + np.roll(noise, -1, axis=0) + np.roll(noise, 1, axis=1) + np.roll(noise, -1, axis=1)) / 5
+    noise = smooth_noise(np.random.rand(height, width), smoothness)
     height_map = (noise * max_height).astype(int) * (dungeon == 1)
-    feature_map = np.zeros_like(dungeon, dtype=int)
+    feature_map = np.zeros_like(dungeon, dtype=np.uint8) # 특성 코드는 0~8
     room_heights = np.random.randint(1, max_height + 1, size=len(rooms))
 
     # 방 내부 높이
+    # 방마다 가장자리(-1~1)/내부(-1~0) 높이 변화를 한 번에 뽑아 슬라이스로 대입
     for i, (x, y, w, h) in enumerate(rooms):
-        base_height = room_heights[i]
-        for ry in range(y, y + h): 
-            for rx in range(x, x + w):
-                if dungeon[ry, rx] == 1:
-                    is_edge = rx == x or rx == x + w - 1 or ry == y or ry == y + h - 1
-                    height_map[ry, rx] = max(1, base_height + (np.random.randint(-1, 2) if is_edge else np.random.randint(-1, 1)))
-
-    # 복도 높이, 장애물, 다리
-    all_corridor_points = set(itertools.chain(*corridors)) if corridors else set()
-    for r in range(height): 
-        for c in range(width):
-            if dungeon[r, c] == 1 and (r, c) in all_corridor_points:
-                 is_in_room_interior = any(rx < c < rx + rw - 1 and ry < r < ry + rh - 1 for rx, ry, rw, rh in rooms)
-                 if not is_in_room_interior:
-                    if height_map[r, c] == 0: height_map[r, c] = np.random.randint(corridor_height_range[0], corridor_height_range[1] + 1)
-                    else: height_map[r, c] = max(corridor_height_range[0], min(corridor_height_range[1], height_map[r, c]))
-                    if np.random.rand() < obstacle_prob:
-                         is_surrounded = all(0 <= r+dr < height and 0 <= c+dc < width and dungeon[r+dr, c+dc] == 1 and (r+dr, c+dc) in all_corridor_points for dr, dc in [(-1,0),(1,0),(0,-1),(0,1)])
-                         if is_surrounded: height_map[r, c] += np.random.randint(obstacle_height_range[0], obstacle_height_range[1] + 1); feature_map[r, c] = FEATURE_OBSTACLE
-                    elif feature_map[r, c] == FEATURE_NONE:
-                        h_neighbors = (dungeon[r, c-1]==1) + (dungeon[r, c+1]==1) if 0<c<width-1 else 0
-                        v_neighbors = (dungeon[r-1, c]==1) + (dungeon[r+1, c]==1) if 0<r<height-1 else 0
-                        is_narrow = (h_neighbors + v_neighbors == 2 and h_neighbors != 1)
-                        if is_narrow:
-                             below_empty = (r + 1 < height and dungeon[r+1, c] == 0)
-                             below_far = (r + 1 < height and dungeon[r+1, c] == 1 and height_map[r, c] - height_map[r+1, c] > 5)
-                             if below_empty or below_far: feature_map[r, c] = FEATURE_BRIDGE
-
-    # 보물 배치 (방 내부)
-    for i, (x, y, w, h) in enumerate(rooms):
-        for ry in range(y + 1, y + h - 1): 
-            for rx in range(x + 1, x + w - 1):
-                if dungeon[ry, rx] == 1 and feature_map[ry, rx] == FEATURE_NONE:
-                    if np.random.rand() < treasure_prob: feature_map[ry, rx] = FEATURE_TREASURE; # print(f"보물: ({ry}, {rx})")
-
-    # 함정 및 비밀 힌트 배치
-    all_dungeon_points = np.argwhere(dungeon == 1)
-    for y, x in all_dungeon_points:
-        if feature_map[y, x] != FEATURE_NONE: continue
-        live_neighbors = 0; is_on_edge = False
-        for dy, dx in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-             ny, nx = y + dy, x + dx
-             if 0 <= ny < height and 0 <= nx < width and dungeon[ny, nx] == 1: live_neighbors += 1
-             else: is_on_edge = True
-        if not is_on_edge: # 대각선까지 확인해서 가장자리 아님을 확정
-             if any(not (0 <= y+dy < height and 0 <= x+dx < width and dungeon[y+dy, x+dx] == 1) for dy, dx in [(-1,-1),(-1,1),(1,-1),(1,1)]): is_on_edge = True
-
-        if live_neighbors == 1: # 막다른 길
-             if np.random.rand() < secret_hint_prob: feature_map[y, x] = FEATURE_SECRET_HINT; # print(f"비밀: ({y}, {x})")
-        elif live_neighbors >= 2: # 통로 또는 방
-            # 함정 확률 결정: 복도 중간(이웃2, 가장자리X)은 낮은 확률, 그 외는 기본 확률
-            current_trap_prob = trap_prob_corridor_center if live_neighbors == 2 and not is_on_edge else trap_prob_base
-            if np.random.rand() < current_trap_prob:
-                feature_map[y, x] = FEATURE_TRAP; # print(f"함정: ({y}, {x})")
+        edge_mask = np.ones((h, w), dtype=bool); edge_mask[1:-1, 1:-1] = False
+        offsets = np.where(edge_mask, np.random.randint(-1, 2, size=(h, w)), np.random.randint(-1, 1, size=(h, w)))
+        room_slice = (slice(y, y + h), slice(x, x + w))
+        height_map[room_slice] = np.where(dungeon[room_slice] == 1, np.maximum(1, room_heights[i] + offsets), height_map[room_slice])
+
+    # 복도 높이, 장애물, 다리 - 칸별 루프 대신 마스크와 이웃 개수 배열로 한 번에 처리
+    # 복도 좌표 배열을 이어 붙여 불리언 마스크에 팬시 인덱싱 한 번으로 표시
+    corridor_mask = np.zeros((height, width), dtype=bool)
+    if corridors: corridor_mask[tuple(np.concatenate(corridors).T)] = True
+    floor = dungeon == 1
+    # 방 내부(가장자리 제외) 마스크는 방마다 슬라이스로 한 번만 채움
+    in_room_interior = np.zeros((height, width), dtype=bool)
+    for rx, ry, rw, rh in rooms: in_room_interior[ry+1:ry+rh-1, rx+1:rx+rw-1] = True
+    corridor_tiles = floor & corridor_mask & ~in_room_interior
+    original_heights = height_map.copy() # 다리 판정은 아래 칸의 복도 처리 전 높이와 비교
+    corridor_h_draws = np.random.randint(corridor_height_range[0], corridor_height_range[1] + 1, size=(height, width))
+    corridor_heights = np.where(height_map == 0, corridor_h_draws, np.clip(height_map, corridor_height_range[0], corridor_height_range[1]))
+    height_map[corridor_tiles] = corridor_heights[corridor_tiles]
+    # 장애물: 상하좌우가 모두 복도인 칸에서만
+    obstacle_rolled = corridor_tiles & (np.random.rand(height, width) < obstacle_prob)
+    obstacle_mask = obstacle_rolled & (neighbor_count(floor & corridor_mask, CROSS_KERNEL) == 4)
+    height_map[obstacle_mask] += np.random.randint(obstacle_height_range[0], obstacle_height_range[1] + 1, size=(height, width))[obstacle_mask]
+    feature_map[obstacle_mask] = FEATURE_OBSTACLE
+    # 다리: 수평 또는 수직 한 방향으로만 이웃 2개 (맵 테두리 열/행은 그 방향 이웃을 0으로 봄), 아래가 비었거나 훨씬 낮음
+    h_neighbors = neighbor_count(floor, H_KERNEL); h_neighbors[:, [0, -1]] = 0
+    v_neighbors = neighbor_count(floor, V_KERNEL); v_neighbors[[0, -1], :] = 0
+    is_narrow = (h_neighbors + v_neighbors == 2) & (h_neighbors != 1)
+    below_empty = np.zeros_like(floor); below_empty[:-1] = ~floor[1:]
+    below_far = np.zeros_like(floor); below_far[:-1] = floor[1:] & (height_map[:-1] - original_heights[1:] > 5)
+    bridge_mask = corridor_tiles & ~obstacle_rolled & (feature_map == FEATURE_NONE) & is_narrow & (below_empty | below_far)
+    feature_map[bridge_mask] = FEATURE_BRIDGE
+
+    # 보물 배치 (방 내부) - 복도 처리에 쓴 방 내부 마스크를 재사용하고 난수는 격자로 한 번에
+    treasure_mask = in_room_interior & floor & (feature_map == FEATURE_NONE) & (np.random.rand(height, width) < treasure_prob)
+    feature_map[treasure_mask] = FEATURE_TREASURE
+
+    # 함정 및 비밀 힌트 배치 - 상하좌우/주변 8칸 바닥 개수를 한 번에 계산해 마스크로 분류 (난수도 격자로 한 번에)
+    live_neighbors = neighbor_count(floor, CROSS_KERNEL)
+    is_on_edge = neighbor_count(floor, RING_KERNEL) < 8 # 대각선 포함 주변 8칸 중 벽(또는 맵 밖)이 하나라도 있음
+    candidates = floor & (feature_map == FEATURE_NONE)
+    feature_rolls = np.random.rand(height, width)
+    # 막다른 길(이웃 1)은 비밀 힌트, 통로/방(이웃 2 이상)은 함정 - 복도 중간(이웃 2, 가장자리 X)은 낮은 확률
+    secret_mask = candidates & (live_neighbors == 1) & (feature_rolls < secret_hint_prob)
+    current_trap_prob = np.where((live_neighbors == 2) & ~is_on_edge, trap_prob_corridor_center, trap_prob_base)
+    trap_mask = candidates & (live_neighbors >= 2) & (feature_rolls < current_trap_prob)
+    feature_map[secret_mask] = FEATURE_SECRET_HINT
+    feature_map[trap_mask] = FEATURE_TRAP
 
     height_map = np.maximum(height_map, 1) * (dungeon == 1)
     return height_map, feature_map
@@ -208,10 +285,50 @@ def select_entrance_exit(dungeon, rooms, height_map, feature_map):
             if 0 <= nr < dungeon.shape[0] and 0 <= nc < dungeon.shape[1] and dungeon[nr, nc] == 1 and (nr, nc) != entrance: height_map[nr, nc] = max(1, height_map[nr, nc] // 2)
     return entrance, exit_coords
 
+def _bfs_flat(walkable, heights, width, start, goal, max_height_diff):
+    """
+    1차원으로 펼친 격자(인덱스 = y*width + x)에서 BFS 수행
+    고정 크기 배열 큐와 부모 인덱스 배열을 사용하므로 numba로 컴파일 가능
+    반환: (부모 인덱스 배열, 방문 여부 배열, 출구 도달 여부)
+    """
+    n = walkable.shape[0]
+    height = n // width
+    queue = np.empty(n, dtype=np.int32)
+    parents = np.full(n, -1, dtype=np.int32)
+    visited = np.zeros(n, dtype=np.bool_)
+    head = 0; tail = 0
+    queue[tail] = start; tail += 1
+    visited[start] = True
+    while head < tail:
+        c = queue[head]; head += 1
+        if c == goal: return parents, visited, True
+        y = c // width; x = c - y * width
+        # 상, 하, 좌, 우 (맵 밖은 건너뜀)
+        for k in range(4):
+            if k == 0:
+                if y == 0: continue
+                nc = c - width
+            elif k == 1:
+                if y == height - 1: continue
+                nc = c + width
+            elif k == 2:
+                if x == 0: continue
+                nc = c - 1
+            else:
+                if x == width - 1: continue
+                nc = c + 1
+            if walkable[nc] and not visited[nc] and abs(heights[nc] - heights[c]) <= max_height_diff:
+                visited[nc] = True; parents[nc] = c
+                queue[tail] = nc; tail += 1
+    return parents, visited, False
+
+if njit is not None:
+    _bfs_flat = njit(cache=True)(_bfs_flat)
+
 def find_path_bfs(dungeon, height_map, feature_map, entrance, exit_coords, max_height_diff=4):
     # ... (map6.py와 거의 동일) ...
     if entrance is None or exit_coords is None: return None, None
-    height, width = dungeon.shape; visited = np.zeros_like(dungeon, dtype=bool); parent = {}; queue = deque([(entrance[0], entrance[1])])
+    height, width = dungeon.shape
     if not (0 <= entrance[0] < height and 0 <= entrance[1] < width and dungeon[entrance[0], entrance[1]] == 1):
         print(f"오류: 입구 {entrance} 유효X."); q=deque([entrance]); visited_s={entrance}; new_e=None
         while q:
@@ -222,26 +339,31 @@ def find_path_bfs(dungeon, height_map, feature_map, entrance, exit_coords, max_h
                  if (ny,nx) not in visited_s:
                      q.append((ny,nx))
                      visited_s.add((ny,nx))
-        if new_e: print(f"유효 입구 {new_e}로 변경."); entrance=new_e; queue=deque([entrance])
+        if new_e: print(f"유효 입구 {new_e}로 변경."); entrance=new_e
         else: print("유효 입구 못찾음."); return None, None
-    visited[entrance[0], entrance[1]] = True
     directions = [(-1,0),(1,0),(0,-1),(0,1)]
-    path_found = False
-    
-    while queue:
-        y, x = queue.popleft()
-        if (y, x) == exit_coords:
-            path_found = True
-            break
-        current_h = height_map[y,x] if height_map[y,x]>0 else 1
-        for dy, dx in directions:
-            ny, nx = y+dy, x+dx
-            if (0<=ny<height and 0<=nx<width and dungeon[ny,nx]==1 and not visited[ny,nx]):
-                next_h = height_map[ny,nx] if height_map[ny,nx]>0 else 1
-                if abs(next_h-current_h) <= max_height_diff:
-                    visited[ny,nx] = True
-                    queue.append((ny,nx))
-                    parent[(ny,nx)]=(y,x)
+    # 좌표는 y*width + x 정수 인덱스로 다루고, 부모는 dict 대신 평탄화한 int32 배열에 기록
+    start = entrance[0] * width + entrance[1]; goal = exit_coords[0] * width + exit_coords[1]
+    if njit is not None:
+        # numba 컴파일된 BFS 사용 (높이 0은 1로 간주)
+        parents, visited_flat, path_found = _bfs_flat(np.ascontiguousarray(dungeon == 1).ravel(),
+                                                      np.maximum(height_map, 1).astype(np.int64, copy=False).ravel(),
+                                                      width, start, goal, max_height_diff)
+        visited = visited_flat.reshape(height, width)
+    else:
+        visited = np.zeros_like(dungeon, dtype=bool); parents = np.full(height * width, -1, dtype=np.int32)
+        queue = deque([(entrance[0], entrance[1])]); visited[entrance[0], entrance[1]] = True
+        path_found = False
+        while queue:
+            y, x = queue.popleft()
+            if (y, x) == exit_coords: path_found = True; break
+            current_h = height_map[y,x] if height_map[y,x]>0 else 1
+            for dy, dx in directions:
+                ny, nx = y+dy, x+dx
+                if (0<=ny<height and 0<=nx<width and dungeon[ny,nx]==1 and not visited[ny,nx]):
+                    next_h = height_map[ny,nx] if height_map[ny,nx]>0 else 1
+                    if abs(next_h-current_h) <= max_height_diff:
+                        visited[ny,nx] = True; queue.append((ny,nx)); parents[ny * width + nx] = y * width + x
     if not path_found:
         problematic_points = []
         visited_coords = np.argwhere(visited & (dungeon==1))
@@ -253,12 +375,12 @@ def find_path_bfs(dungeon, height_map, feature_map, entrance, exit_coords, max_h
                     next_h = height_map[ny,nx] if height_map[ny,nx]>0 else 1
                     if abs(next_h-current_h) > max_height_diff: problematic_points.append(((y,x),(ny,nx),abs(next_h-current_h)))
         return None, problematic_points
-    path = []; curr = exit_coords
-    while curr != entrance:
-        path.append(curr)
-        if feature_map[curr[0], curr[1]] == FEATURE_NONE: feature_map[curr[0], curr[1]] = FEATURE_PATH
-        curr = parent[curr]
-    path.append(entrance); path.reverse()
+    # 출구에서 부모 인덱스를 따라 입구(부모 -1)까지 거슬러 올라가며 경로 복원
+    path = []; c = goal
+    while c != -1: path.append(divmod(int(c), width)); c = parents[c]
+    path.reverse()
+    ys, xs = np.array(path).T; free = feature_map[ys, xs] == FEATURE_NONE
+    feature_map[ys[free], xs[free]] = FEATURE_PATH
     feature_map[entrance[0], entrance[1]] = FEATURE_ENTRANCE; feature_map[exit_coords[0], exit_coords[1]] = FEATURE_EXIT
     print(f"BFS 경로 찾음 (길이: {len(path)})")
     return path, None